@@ -1,5 +1,20 @@
-from flask import Flask, jsonify, render_template
-from bytez import Bytez
+import atexit
+import json
+import os
+import time
+
+from flask import Flask, Response, g, jsonify, render_template, request, url_for
+
+from batch import BatchRunner, parse_items
+import instrumentation
+from bytez_pool import ModelPool, is_outage
+from http_cache import PageCache, compress, make_etag, supported_encodings
+from instrumentation import SlowRequestProfiler, annotate, record_error, stage
+from request_log import RequestLogger
+from result_cache import FlightTimeout, ResultCache, is_success
+from retrieval import DocumentIndex, build_prompt
+from scheduler import BATCH, INTERACTIVE, Scheduler, SchedulerRejected, deadline_remaining
+from streaming import chunk_text, iter_generation, sse_event
 
 # Inisialisasi aplikasi Flask
 app = Flask(__name__)
@@ -8,53 +23,456 @@ app = Flask(__name__)
 KEY = "4a691e713db62c8e26dd394f5955f1fe"
 INPUT_PROMPT = "Once upon a time, there was a robot"
 MODEL_NAME = "abhinema/gpt"
+GENERATION_PARAMS = None
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 5))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 60))  # batas panggilan tanpa deadline
+HEALTH_CHECK_INTERVAL = float(os.environ.get("HEALTH_CHECK_INTERVAL", 60))  # 0 = nonaktif
+# -------------------------
+
+# --- Konfigurasi cache hasil ---
+CACHE_TTL = int(os.environ.get("CACHE_TTL", 300))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 256))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 8 * 1024 * 1024))
+CACHE_DIR = os.environ.get("CACHE_DIR")  # kosong = cache hanya di memori
+# -------------------------------
+
+# --- Konfigurasi batch ---
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 16))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 1000))
+BATCH_ITEM_TIMEOUT = float(os.environ.get("BATCH_ITEM_TIMEOUT", 60))
 # -------------------------
 
+# --- Konfigurasi retrieval (RAG) ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_DOCUMENTS = [os.path.join(BASE_DIR, "dokumen_saya.txt")]
+RAG_DOCS_DIR = os.environ.get("RAG_DOCS_DIR")  # direktori dokumen tambahan (.txt/.md)
+RAG_INDEX_PATH = os.environ.get("RAG_INDEX_PATH", os.path.join(BASE_DIR, ".rag_index.bin"))
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", 3))
+RAG_METHOD = os.environ.get("RAG_METHOD", "bm25")  # bm25 | embedding | hybrid
+# -----------------------------------
+
+# --- Konfigurasi log request ---
+REQUEST_LOG_PATH = os.environ.get("REQUEST_LOG_PATH", os.path.join(BASE_DIR, "requests.jsonl"))  # kosong = nonaktif
+REQUEST_LOG_ROTATE_BYTES = int(os.environ.get("REQUEST_LOG_ROTATE_BYTES", 50 * 1024 * 1024))
+REQUEST_LOG_FSYNC = os.environ.get("REQUEST_LOG_FSYNC", "interval")  # never | batch | interval
+# -------------------------------
+
+# --- Konfigurasi cache HTTP ---
+HTTP_MAX_AGE = int(os.environ.get("HTTP_MAX_AGE", 60))  # Cache-Control max-age (detik)
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+# ------------------------------
+
+# --- Konfigurasi penjadwal upstream ---
+UPSTREAM_SLOTS = int(os.environ.get("UPSTREAM_SLOTS", 8))  # panggilan paralel maksimum ke Bytez
+INTERACTIVE_TIMEOUT = float(os.environ.get("INTERACTIVE_TIMEOUT", 25))  # di bawah --timeout gunicorn
+HEDGE_REQUESTS = os.environ.get("HEDGE_REQUESTS", "1") == "1"
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", 5))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", 30))
+# --------------------------------------
+
+# --- Konfigurasi profiler request lambat ---
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))  # 0 = nonaktif
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+# -------------------------------------------
+
+# Pool klien/model Bytez, dibuat sekali per worker dan dipakai ulang antar request
+model_pool = ModelPool(
+    KEY,
+    timeout=(UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT),
+    deadline=deadline_remaining,
+    health_interval=HEALTH_CHECK_INTERVAL,
+)
+
+# Cache hasil model.run, dengan deduplikasi request identik yang bersamaan
+result_cache = ResultCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    ttl=CACHE_TTL,
+    disk_dir=CACHE_DIR,
+)
+
+# Indeks dokumen untuk RAG; diperbarui di latar belakang hanya jika isi file berubah
+document_index = DocumentIndex(RAG_INDEX_PATH, RAG_DOCUMENTS, RAG_DOCS_DIR)
+
+# Penjadwal panggilan ke Bytez (prioritas, deadline, hedging, circuit breaker)
+scheduler = Scheduler(
+    slots=UPSTREAM_SLOTS,
+    hedge=HEDGE_REQUESTS,
+    breaker_threshold=BREAKER_THRESHOLD,
+    breaker_cooldown=BREAKER_COOLDOWN,
+)
+
+# Cache byte halaman yang sudah dirender (dan dikompres), per ETag
+page_cache = PageCache(max_bytes=PAGE_CACHE_MAX_BYTES)
+
+# Thread pool bersama untuk endpoint /batch
+batch_runner = BatchRunner(max_workers=BATCH_MAX_WORKERS)
+
+# Log request ke JSONL, ditulis per batch oleh thread latar belakang
+request_logger = RequestLogger(
+    REQUEST_LOG_PATH,
+    rotate_bytes=REQUEST_LOG_ROTATE_BYTES,
+    fsync_policy=REQUEST_LOG_FSYNC,
+) if REQUEST_LOG_PATH else None
+if request_logger is not None:
+    atexit.register(request_logger.close)
+
+# Profiler sampling untuk request yang melewati PROFILE_SLOW_MS
+slow_profiler = SlowRequestProfiler(PROFILE_SLOW_MS, PROFILE_DIR) if PROFILE_SLOW_MS else None
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    instrumentation.begin_request()
+    instrumentation.IN_FLIGHT.inc()
+    if slow_profiler is not None:
+        slow_profiler.begin()
+
+@app.after_request
+def finish_request_timing(response):
+    elapsed = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    response.headers['Server-Timing'] = instrumentation.server_timing(elapsed)
+    if response.is_streamed:
+        # Body stream (/stream, /batch) baru dihasilkan setelah hook ini:
+        # latensi, ukuran, dan in-flight dicatat saat body selesai dikirim.
+        g.stream_observed = True
+        observe_stream(response, route, g.request_started)
+        return response
+    instrumentation.REQUEST_LATENCY.labels(route, response.status_code).observe(elapsed)
+    instrumentation.RESPONSE_SIZE.labels(route).observe(response.calculate_content_length() or 0)
+    return response
+
+@app.teardown_request
+def end_request_timing(exc):
+    if g.get('stream_observed'):
+        return
+    instrumentation.IN_FLIGHT.dec()
+    if slow_profiler is not None:
+        slow_profiler.end(request.url_rule.rule if request.url_rule else 'unmatched')
+
+def observe_stream(response, route, started):
+    """
+    Mengukur respons streaming sampai body-nya ditutup oleh server WSGI
+    (selesai dikirim atau klien terputus).
+    """
+    body = response.response
+    sent = [0]
+
+    def counted():
+        for chunk in body:
+            sent[0] += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+
+    def finish():
+        # Generator asli ditutup juga walaupun belum sempat dimulai
+        close = getattr(body, 'close', None)
+        if close is not None:
+            close()
+        instrumentation.REQUEST_LATENCY.labels(route, response.status_code).observe(time.perf_counter() - started)
+        instrumentation.RESPONSE_SIZE.labels(route).observe(sent[0])
+        instrumentation.IN_FLIGHT.dec()
+        if slow_profiler is not None:
+            slow_profiler.end(route)
+
+    response.response = counted()
+    response.call_on_close(finish)
+
+def log_request(route, prompt, latency_ms, cache_status, output=None, error=None, query=None):
+    """
+    Mencatat satu request ke log (tidak memblokir; bisa dibuang saat antrean penuh).
+    `query` adalah parameter `q` mentah dari pengguna (sebelum disisipi konteks
+    RAG), sehingga traffic bisa diputar ulang apa adanya.
+    """
+    if request_logger is None:
+        return
+    request_logger.log({
+        'ts': time.time(),
+        'route': route,
+        'model': MODEL_NAME,
+        'query': query,
+        'prompt': prompt,
+        'latency_ms': round(latency_ms, 3),
+        'cache': cache_status,
+        'output_chars': len(str(output)) if output else 0,
+        'error': error,
+    })
+
+def page_response(body, etag, encoding, status=200):
+    """
+    Respons halaman hasil dengan validator HTTP (ETag, Cache-Control, Vary).
+    """
+    response = Response(body if status != 304 else None, status=status, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={HTTP_MAX_AGE}"
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding != 'identity' and status != 304:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def resolve_prompt():
+    """
+    Prompt untuk request ini. Jika ada parameter `q`, potongan dokumen yang
+    relevan disisipkan ke prompt (RAG); jika tidak, memakai INPUT_PROMPT.
+    """
+    question = request.args.get('q', '').strip()
+    if not question:
+        return INPUT_PROMPT
+    try:
+        with stage('retrieval'):
+            passages = document_index.search(question, k=RAG_TOP_K, method=RAG_METHOD)
+    except Exception:
+        # Indeks bermasalah tidak boleh menggagalkan request: pakai pertanyaan apa adanya
+        record_error('retrieval')
+        passages = []
+    return build_prompt(question, passages)
+
+def run_cached(model_name, prompt, params=None, priority=INTERACTIVE, timeout=INTERACTIVE_TIMEOUT):
+    """
+    Menjalankan model lewat cache hasil dan penjadwal. Mengembalikan (response, status_cache).
+    Jika penjadwal menolak (antrean penuh, deadline habis, atau circuit breaker
+    terbuka) atau request identik yang ditunggu tidak selesai dalam `timeout`,
+    hasil lama dari cache dipakai bila ada dengan status 'stale'.
+    """
+    def upstream():
+        return instrumentation.timed_upstream(
+            model_name,
+            lambda: model_pool.run(model_name, prompt, params),
+            is_success,
+        )
+
+    try:
+        return result_cache.get_or_run(
+            model_name, prompt, params,
+            lambda: scheduler.call(upstream, priority, timeout, lambda r: not is_success(r), is_outage),
+            wait_timeout=timeout,
+        )
+    except (SchedulerRejected, FlightTimeout):
+        stale = result_cache.peek(model_name, prompt, params, stale=True)
+        if stale is None:
+            raise
+        return stale, 'stale'
+
 @app.route('/')
 def run_bytez_model():
     """
     Mengakses API Bytez, menjalankan model AI, dan merender hasilnya ke HTML.
     Menangani potensi 'too many values to unpack'.
     """
+    query = request.args.get('q') or None
+    prompt = resolve_prompt()
+
+    if request.args.get('stream'):
+        # Mode progresif: halaman dikirim langsung, output diisi lewat /stream
+        return render_template(
+            'index.html',
+            model_name=MODEL_NAME,
+            input_prompt=prompt,
+            ai_output="",
+            error=None,
+            stream_url=url_for('stream_bytez_model', q=query),
+        )
+
+    started = time.perf_counter()
+    encoding = request.accept_encodings.best_match(supported_encodings(), default='identity')
+
+    # Jika hasil sudah ada di cache, validasi (304) atau halaman tersimpan
+    # dilayani tanpa inference dan tanpa render ulang
+    cached = result_cache.peek(MODEL_NAME, prompt, GENERATION_PARAMS)
+    if cached is not None:
+        etag = make_etag(MODEL_NAME, prompt, cached[0], encoding)
+        annotate('cache', 'hit')
+        if request.if_none_match.contains_weak(etag):
+            log_request('/', prompt, (time.perf_counter() - started) * 1000, 'not_modified', cached[0],
+                        query=query)
+            return page_response(None, etag, encoding, status=304)
+        body = page_cache.get(etag)
+        if body is not None:
+            annotate('page', 'hit')
+            log_request('/', prompt, (time.perf_counter() - started) * 1000, 'page', cached[0], query=query)
+            return page_response(body, etag, encoding)
+
     output_text = "Gagal memproses permintaan."
     error_message = None
+    response = None
+    cache_status = None
     
     try:
-        sdk = Bytez(KEY)
-        model = sdk.model(MODEL_NAME)
-        
         # --- PERBAIKAN UTAMA DI SINI ---
         # Menggunakan *response untuk menangkap semua nilai yang dikembalikan
-        response = model.run(INPUT_PROMPT)
+        if cached is not None:
+            response, cache_status = cached, 'hit'
+        else:
+            response, cache_status = run_cached(MODEL_NAME, prompt, GENERATION_PARAMS)
+        annotate('cache', cache_status)
         
-        if len(response) == 2:
-            # Format lama/standar: (output, error)
-            output, error = response
-            
-            if output:
+        if len(response) >= 2:
+            # Format (output, error); SDK versi baru mengembalikan
+            # Response(output, error, provider), jadi dua nilai pertama yang dipakai
+            output, error = response[0], response[1]
+
+            # Sukses ditentukan oleh is_success, sama dengan aturan cache dan ETag
+            if is_success(response):
                 output_text = output
             elif error:
                 error_message = f"Error dari Bytez: {error}"
                 output_text = "Gagal mendapatkan hasil dari model."
-        elif len(response) > 2:
-            # Menangani jika Bytez mengembalikan lebih dari 2 nilai
-            error_message = f"Bytez mengembalikan {len(response)} nilai, bukan 2. Mungkin API telah berubah."
+                record_error('bytez_error')
         else:
             # Menangani jika Bytez mengembalikan 0 atau 1 nilai
             error_message = f"Bytez mengembalikan {len(response)} nilai, bukan 2."
+            record_error('unexpected_response')
 
     except Exception as e:
         # Menangani exception umum, termasuk network error atau Bytez error lainnya
         error_message = f"Terjadi kesalahan saat memproses: {e}"
+        record_error(type(e).__name__)
+
+    log_request('/', prompt, (time.perf_counter() - started) * 1000, cache_status,
+                output_text if not error_message else None, error_message, query)
+
+    # Halaman hanya bisa divalidasi/di-cache jika berasal dari hasil Bytez yang sukses
+    etag = None
+    if response is not None and error_message is None and cache_status != 'stale' and is_success(response):
+        etag = make_etag(MODEL_NAME, prompt, response[0], encoding)
+        if request.if_none_match.contains_weak(etag):
+            return page_response(None, etag, encoding, status=304)
 
     # Mengirim data ke template index.html
-    return render_template(
-        'index.html', 
-        model_name=MODEL_NAME,
-        input_prompt=INPUT_PROMPT,
-        ai_output=output_text,
-        error=error_message
+    with stage('render'):
+        html = render_template(
+            'index.html', 
+            model_name=MODEL_NAME,
+            input_prompt=prompt,
+            ai_output=output_text,
+            error=error_message
+        )
+    if etag is None:
+        return html, {'Cache-Control': 'no-store'}
+
+    with stage('compress'):
+        body = compress(html.encode('utf-8'), encoding)
+    page_cache.put(etag, body)
+    return page_response(body, etag, encoding)
+
+@app.route('/stream')
+def stream_bytez_model():
+    """
+    Mengirim hasil generasi secara bertahap sebagai Server-Sent Events.
+    Jika klien terputus, generator ditutup dan stream ke Bytez ikut dihentikan.
+    """
+    query = request.args.get('q') or None
+    prompt = resolve_prompt()
+    cached = result_cache.peek(MODEL_NAME, prompt, GENERATION_PARAMS)
+    cache_status = 'hit'
+    if cached is None and scheduler.breaker.state == 'open':
+        # Bytez sedang gagal: pakai hasil lama jika ada
+        cached = result_cache.peek(MODEL_NAME, prompt, GENERATION_PARAMS, stale=True)
+        cache_status = 'stale'
+
+    def generate():
+        started = time.perf_counter()
+        # Komentar SSE agar byte pertama langsung terkirim ke browser
+        yield ": mulai\n\n"
+
+        if cached is not None:
+            for chunk in chunk_text(cached[0]):
+                yield sse_event('chunk', chunk)
+            yield sse_event('done', {'cache': cache_status})
+            log_request('/stream', prompt, (time.perf_counter() - started) * 1000, cache_status, cached[0],
+                        query=query)
+            return
+
+        chunks = iter_generation(model_pool, MODEL_NAME, prompt, GENERATION_PARAMS)
+        parts = []
+        error_message = "Klien terputus."
+        try:
+            with scheduler.reserve(INTERACTIVE, INTERACTIVE_TIMEOUT, is_outage):
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield sse_event('chunk', chunk)
+            error_message = None
+        except Exception as e:
+            error_message = f"Terjadi kesalahan saat memproses: {e}"
+            record_error(type(e).__name__)
+            yield sse_event('error', error_message)
+            return
+        finally:
+            chunks.close()
+            log_request('/stream', prompt, (time.perf_counter() - started) * 1000, 'miss',
+                        "".join(parts), error_message, query)
+
+        # Hasil stream tidak disimpan ke cache hasil: bentuknya tidak dijamin
+        # sama dengan output `model.run` biasa yang dipakai halaman utama.
+        yield sse_event('done', {'cache': 'miss'})
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/batch', methods=['POST'])
+def run_batch():
+    """
+    Menjalankan banyak prompt sekaligus secara paralel (konkurensi terbatas).
+    Hasil dikirim sebagai NDJSON, satu baris per item sesuai urutan selesai.
+    Konkurensi yang benar-benar dipakai dikirim di header `X-Batch-Concurrency`.
+    """
+    payload = request.get_json(silent=True)
+    try:
+        items = parse_items(payload, BATCH_MAX_ITEMS)
+        max_concurrency = int(payload.get('max_concurrency', BATCH_MAX_WORKERS))
+        timeout = float(payload.get('timeout', BATCH_ITEM_TIMEOUT))
+    except (TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    # Lebih dari UPSTREAM_SLOTS tidak menambah throughput: sisanya hanya mengantre di penjadwal
+    max_concurrency = max(1, min(max_concurrency, BATCH_MAX_WORKERS, UPSTREAM_SLOTS))
+    timeout = max(0.1, min(timeout, BATCH_ITEM_TIMEOUT))
+
+    def generate():
+        results = batch_runner.run(
+            items,
+            lambda prompt, params: run_cached(MODEL_NAME, prompt, params, BATCH, timeout),
+            max_concurrency,
+            timeout,
+        )
+        for result in results:
+            if not result['ok']:
+                record_error('batch_item')
+            log_request('/batch', items[result['index']]['prompt'], result['elapsed_ms'],
+                        result.get('cache'), result.get('output'), result.get('error'))
+            yield json.dumps(result) + "\n"
+
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'X-Batch-Concurrency': str(max_concurrency)},
+    )
+
+@app.route('/metrics')
+def metrics():
+    """
+    Metrik Prometheus (digabung dari semua worker jika mode multiproses aktif).
+    """
+    body, content_type = instrumentation.render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route('/stats')
+def stats():
+    """
+    Statistik internal worker (pool Bytez, cache hasil, dan indeks dokumen).
+    """
+    return jsonify(
+        pool=model_pool.stats(),
+        cache=result_cache.stats(),
+        page_cache=page_cache.stats(),
+        retrieval=document_index.stats(),
+        scheduler=scheduler.stats(),
+        request_log=request_logger.stats() if request_logger is not None else None,
     )
 
 if __name__ == '__main__':
+    model_pool.warm([MODEL_NAME])
+    document_index.start()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Menjalankan banyak prompt sekaligus dengan konkurensi terbatas.
+
+Semua batch berbagi satu thread pool per worker, sehingga jumlah panggilan
+paralel ke Bytez tetap terbatas walaupun ada beberapa batch bersamaan.
+Batas waktu item dihitung sejak item mulai berjalan, bukan sejak masuk
+antrean pool, supaya item yang mengantre di belakang batch lain tidak
+habis waktunya sebelum sempat dijalankan.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from result_cache import is_success
+
+
+class BatchRunner:
+    """
+    Thread pool bersama untuk batch inference. Hasil dikembalikan sesuai
+    urutan selesai, bukan urutan input.
+    """
+
+    def __init__(self, max_workers=16):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Dibuat saat pertama dipakai supaya thread tidak dibuat di proses master sebelum fork
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='batch',
+                )
+            return self._executor
+
+    @staticmethod
+    def _run_item(index, item, run, started_at):
+        started_at[index] = time.monotonic()
+        started = time.perf_counter()
+        try:
+            response, cache_status = run(item['prompt'], item.get('params'))
+        except Exception as e:
+            return {
+                'index': index,
+                'ok': False,
+                'error': f"Terjadi kesalahan saat memproses: {e}",
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+            }
+        result = {
+            'index': index,
+            'ok': is_success(response),
+            'cache': cache_status,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+        if result['ok']:
+            result['output'] = response[0]
+        else:
+            error = response[1] if len(response) >= 2 else None
+            result['error'] = f"Error dari Bytez: {error}" if error else "Bytez tidak mengembalikan output."
+        return result
+
+    def run(self, items, run, max_concurrency, timeout):
+        """
+        Generator hasil per item. `run(prompt, params)` harus mengembalikan
+        `(response, status_cache)`. Item yang berjalan lebih dari `timeout`
+        detik dilaporkan sebagai gagal; hasilnya yang datang belakangan
+        diabaikan, tetapi item itu tetap dihitung ke `max_concurrency` sampai
+        benar-benar selesai supaya batch tidak memakai thread melebihi jatahnya.
+        """
+        executor = self._get_executor()
+        queue = list(enumerate(items))
+        queue.reverse()
+        pending = {}  # future -> index
+        abandoned = set()
+        started_at = {}  # index -> waktu mulai (diisi oleh thread item)
+
+        try:
+            while queue or pending:
+                while queue and len(pending) + len(abandoned) < max_concurrency:
+                    index, item = queue.pop()
+                    future = executor.submit(self._run_item, index, item, run, started_at)
+                    pending[future] = index
+
+                # Item yang belum mulai belum punya deadline; deadline-nya
+                # paling cepat `timeout` detik dari sekarang.
+                deadlines = [started_at[index] + timeout for index in pending.values() if index in started_at]
+                wait_for = min(deadlines) - time.monotonic() if deadlines else timeout
+                done, _ = wait(
+                    set(pending) | abandoned,
+                    timeout=max(wait_for, 0),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future in abandoned:
+                        abandoned.discard(future)
+                        continue
+                    pending.pop(future)
+                    yield future.result()
+
+                now = time.monotonic()
+                for future, index in list(pending.items()):
+                    if index in started_at and started_at[index] + timeout <= now:
+                        pending.pop(future)
+                        abandoned.add(future)
+                        yield {
+                            'index': index,
+                            'ok': False,
+                            'error': f"Melebihi batas waktu {timeout} detik.",
+                            'elapsed_ms': round((now - started_at[index]) * 1000, 3),
+                        }
+        finally:
+            # Klien terputus: item yang belum mulai tidak perlu dijalankan
+            for future in pending:
+                future.cancel()
+
+
+def parse_items(payload, max_items):
+    """
+    Memvalidasi body JSON batch. Item boleh berupa string prompt atau
+    objek {"prompt": ..., "params": {...}}. Melempar ValueError jika tidak valid.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('items'), list):
+        raise ValueError("Body harus berupa objek JSON dengan daftar 'items'.")
+    raw_items = payload['items']
+    if not raw_items:
+        raise ValueError("'items' tidak boleh kosong.")
+    if len(raw_items) > max_items:
+        raise ValueError(f"Maksimal {max_items} item per batch.")
+
+    items = []
+    for position, raw in enumerate(raw_items):
+        if isinstance(raw, str):
+            raw = {'prompt': raw}
+        if not isinstance(raw, dict) or not isinstance(raw.get('prompt'), str):
+            raise ValueError(f"Item {position} harus berisi 'prompt' berupa string.")
+        params = raw.get('params')
+        if params is not None and not isinstance(params, dict):
+            raise ValueError(f"'params' pada item {position} harus berupa objek.")
+        items.append({'prompt': raw['prompt'], 'params': params})
+    return items
@@ -0,0 +1 @@
+"""Benchmark dan load test untuk app:app dengan Bytez pengganti lokal."""
@@ -0,0 +1,23 @@
+"""
+Entry point WSGI untuk benchmark: aplikasi asli, tetapi klien Bytez diarahkan
+ke server pengganti lokal (`FAKE_BYTEZ_URL`).
+
+    FAKE_BYTEZ_URL=http://127.0.0.1:8765 gunicorn bench.bench_app:app
+"""
+import os
+
+from bytez import Bytez
+
+import app as application
+
+FAKE_BYTEZ_URL = os.environ.get("FAKE_BYTEZ_URL", "http://127.0.0.1:8765")
+
+
+def fake_client(api_key):
+    sdk = Bytez(api_key)
+    sdk._client.host = f"{FAKE_BYTEZ_URL.rstrip('/')}/models/v2/"
+    return sdk
+
+
+application.model_pool._client_factory = fake_client
+app = application.app
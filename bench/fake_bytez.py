@@ -0,0 +1,135 @@
+"""
+Server HTTP lokal pengganti Bytez untuk benchmark.
+
+Meniru endpoint yang dipakai SDK (`list/models` dan `POST /models/v2/<model>`),
+termasuk mode streaming, dengan latensi, tingkat error, dan ukuran output
+yang bisa diatur.
+
+    python -m bench.fake_bytez --port 8765 --latency lognormal:-1.6,0.5 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = "once upon a time there was a robot who dreamed of electric sheep".split()
+
+
+def parse_latency(spec):
+    """
+    Mengubah spesifikasi latensi (detik) menjadi fungsi sampler:
+    `fixed:0.2`, `uniform:0.1,0.5`, atau `lognormal:mu,sigma`.
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Distribusi latensi tidak dikenal: {spec}")
+
+
+def make_output(chars):
+    words = []
+    size = 0
+    while size < chars:
+        word = random.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:chars]
+
+
+class FakeBytezHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeBytez/1.0'
+    # Header dan body ditulis terpisah; tanpa ini Nagle + delayed ACK menambah
+    # ~40 ms pada koneksi keep-alive yang dipakai ulang.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/models/v2/list/models'):
+            self._send_json(200, {'output': [{'modelId': 'fake', 'task': 'text-generation'}], 'error': None})
+        else:
+            self._send_json(404, {'output': None, 'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = {}
+        config = self.server.config
+        with self.server.counter_lock:
+            self.server.calls += 1
+
+        latency = max(config['latency'](), 0.0)
+        if random.random() < config['error_rate']:
+            time.sleep(latency)
+            self._send_json(500, {'output': None, 'error': 'fake upstream error'})
+            return
+
+        output = make_output(config['output_chars'])
+        if not body.get('stream'):
+            time.sleep(latency)
+            self._send_json(200, {'output': output, 'error': None, 'provider': 'fake'})
+            return
+
+        # Streaming: latensi dibagi rata ke setiap potongan
+        pieces = [output[i:i + 32] for i in range(0, len(output), 32)] or ['']
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for piece in pieces:
+            time.sleep(latency / len(pieces))
+            data = piece.encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def make_server(port, latency='fixed:0.2', error_rate=0.0, output_chars=400, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), FakeBytezHandler)
+    server.daemon_threads = True
+    server.config = {
+        'latency': parse_latency(latency),
+        'error_rate': error_rate,
+        'output_chars': output_chars,
+    }
+    server.calls = 0
+    server.counter_lock = threading.Lock()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed:0.2')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--output-chars', type=int, default=400)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.error_rate, args.output_chars, args.host)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Load test `app:app` di bawah gunicorn dengan server Bytez pengganti lokal.
+
+Setiap skenario (`workers x threads : worker-class`) menjalankan gunicorn baru,
+mengirim request secara paralel (atau me-replay `requests.jsonl`), lalu
+melaporkan throughput, latensi p50/p95/p99, error, memori (RSS) per worker, dan
+jumlah panggilan ke upstream. Request sintetis memakai `q` berbeda per request
+supaya tidak digabung oleh single-flight.
+Hasil bisa disimpan sebagai baseline dan dibandingkan pada run berikutnya;
+exit code 1 jika ada regresi melewati toleransi.
+
+    python -m bench.run_bench --matrix 1x1:sync,1x4:gthread --requests 200 --concurrency 8
+    python -m bench.run_bench --replay requests.jsonl --save-baseline bench/baseline.json
+    python -m bench.run_bench --baseline bench/baseline.json --tolerance 15
+
+`bench/baseline.json` adalah hasil run dengan pengaturan default (matrix,
+latensi palsu, jumlah request). Angkanya bergantung pada mesin; simpan ulang
+baseline di mesin yang sama sebelum membandingkan jika perlu.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def parse_matrix(spec):
+    """`1x4:gthread,2x1:sync` -> [(workers, threads, worker_class), ...]"""
+    scenarios = []
+    for item in spec.split(','):
+        size, _, worker_class = item.strip().partition(':')
+        workers, _, threads = size.partition('x')
+        scenarios.append((int(workers), int(threads or 1), worker_class or 'sync'))
+    return scenarios
+
+
+def load_replay(path, limit=None):
+    """
+    Mengambil record traffic dari log request (JSONL). Record tanpa `route`
+    (misalnya baris yang bukan log traffic) dilewati. Request halaman dikirim
+    ulang dengan parameter `q` aslinya (field `query`).
+    """
+    plan = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            route = record.get('route') if isinstance(record, dict) else None
+            if route in ('/', '/stream'):
+                query = record.get('query')
+                path = f"{route}?{urlencode({'q': query})}" if query else route
+                plan.append(('GET', path, None, record.get('ts')))
+            elif route == '/batch' and record.get('prompt'):
+                body = json.dumps({'items': [record['prompt']]})
+                plan.append(('POST', '/batch', body, record.get('ts')))
+            if limit and len(plan) >= limit:
+                break
+    return plan
+
+
+def synthetic_plan(count, route):
+    """
+    Setiap request memakai `q` berbeda; prompt yang identik akan digabung oleh
+    single-flight sehingga sebagian besar request tidak pernah sampai ke upstream.
+    """
+    return [('GET', f"{route}?{urlencode({'q': f'bench {i}'})}", None, None) for i in range(count)]
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/stats')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def worker_pids(master_pid):
+    """PID anak dari proses master gunicorn (Linux, lewat /proc)."""
+    pids = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master_pid:
+            pids.append(int(name))
+    return pids
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def send(port, method, path, body, timeout):
+    started = time.perf_counter()
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        headers = {'Content-Type': 'application/json'} if body else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        ok = response.status < 400
+        conn.close()
+    except OSError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def drive(port, plan, concurrency, timeout, replay_speed):
+    """Mengirim semua request di `plan`; jeda antar request mengikuti `ts` jika replay_speed > 0."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    first_ts = next((ts for _, _, _, ts in plan if ts), None)
+    started = time.perf_counter()
+
+    def one(entry):
+        nonlocal errors
+        method, path, body, ts = entry
+        if replay_speed and ts and first_ts:
+            delay = (ts - first_ts) / replay_speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        elapsed, ok = send(port, method, path, body, timeout)
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, plan))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(plan),
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(plan) / wall, 2) if wall else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+def run_scenario(scenario, args, plan, fake_url):
+    workers, threads, worker_class = scenario
+    port = free_port()
+    env = dict(
+        os.environ,
+        FAKE_BYTEZ_URL=fake_url,
+        REQUEST_LOG_PATH='',  # jangan menulis traffic benchmark ke log
+        CACHE_TTL=str(args.cache_ttl),
+    )
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '-w', str(workers), '--threads', str(threads), '-k', worker_class,
+        '--timeout', '120', '-b', f'127.0.0.1:{port}',
+        '--log-level', 'warning',
+        'bench.bench_app:app',
+    ]
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        if not wait_ready(port):
+            raise RuntimeError(f"gunicorn tidak siap untuk skenario {scenario}")
+        if args.warmup:
+            drive(port, plan[:args.warmup], args.concurrency, args.timeout, 0)
+        result = drive(port, plan, args.concurrency, args.timeout, args.replay_speed)
+        memory = [rss_mb(pid) for pid in worker_pids(process.pid)]
+        memory = [m for m in memory if m is not None]
+        result['rss_mb_per_worker'] = round(sum(memory) / len(memory), 1) if memory else None
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def compare(results, baseline, tolerance):
+    """Mengembalikan daftar pesan regresi dibanding baseline (toleransi dalam persen)."""
+    regressions = []
+    factor = tolerance / 100
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get('throughput_rps') and result['throughput_rps'] < base['throughput_rps'] * (1 - factor):
+            regressions.append(f"{name}: throughput {result['throughput_rps']} < baseline {base['throughput_rps']}")
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base.get(key) and result.get(key) and result[key] > base[key] * (1 + factor):
+                regressions.append(f"{name}: {key} {result[key]} > baseline {base[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matrix', default='1x1:sync,1x4:gthread,2x4:gthread',
+                        help="Skenario gunicorn: WORKERSxTHREADS:KELAS, dipisah koma")
+    parser.add_argument('--requests', type=int, default=200, help="Jumlah request sintetis per skenario")
+    parser.add_argument('--route', default='/', help="Route untuk request sintetis")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=130)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--replay', help="File JSONL log request untuk di-replay")
+    parser.add_argument('--replay-speed', type=float, default=0,
+                        help="0 = secepatnya; 1 = ikuti jeda asli; 2 = dua kali lebih cepat")
+    parser.add_argument('--cache-ttl', type=int, default=0,
+                        help="CACHE_TTL untuk app (0 = tanpa cache; request dengan prompt sama "
+                             "yang bersamaan tetap digabung oleh single-flight)")
+    parser.add_argument('--latency', default='fixed:0.2', help="Distribusi latensi Bytez palsu")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--output-chars', type=int, default=400)
+    parser.add_argument('--baseline', help="File baseline JSON untuk dibandingkan")
+    parser.add_argument('--save-baseline', help="Simpan hasil run ini sebagai baseline")
+    parser.add_argument('--tolerance', type=float, default=10, help="Toleransi regresi (persen)")
+    parser.add_argument('--json', help="Tulis hasil lengkap ke file JSON")
+    args = parser.parse_args()
+
+    if args.replay:
+        plan = load_replay(args.replay, args.requests or None)
+        if not plan:
+            parser.error(f"Tidak ada record traffic di {args.replay}")
+    else:
+        plan = synthetic_plan(args.requests, args.route)
+
+    sys.path.insert(0, ROOT)
+    from bench.fake_bytez import make_server
+
+    fake_port = free_port()
+    fake = make_server(fake_port, args.latency, args.error_rate, args.output_chars)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+    fake_url = f'http://127.0.0.1:{fake_port}'
+
+    results = {}
+    try:
+        for scenario in parse_matrix(args.matrix):
+            name = f'{scenario[0]}x{scenario[1]}:{scenario[2]}'
+            calls_before = fake.calls
+            results[name] = run_scenario(scenario, args, plan, fake_url)
+            r = results[name]
+            r['upstream_calls'] = fake.calls - calls_before  # termasuk warmup dan hedging
+            print(f"{name:<18} {r['throughput_rps']:>8} rps  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  "
+                  f"p99 {r['p99_ms']} ms  errors {r['errors']}/{r['requests']}  rss/worker {r['rss_mb_per_worker']} MB  "
+                  f"upstream {r['upstream_calls']}")
+    finally:
+        fake.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESI {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Pool klien Bytez dan handle model yang dipakai ulang antar request.
+
+Satu pool per proses worker gunicorn: setelah fork, isi pool dikosongkan
+supaya koneksi/handle milik proses master tidak ikut terbawa ke worker.
+
+Klien HTTP bawaan SDK memanggil `requests.request` tanpa timeout dan tanpa
+session, sehingga setiap panggilan membuka koneksi TLS baru dan panggilan
+yang macet tidak pernah selesai. Pool mengganti klien itu dengan
+`SessionClient`: koneksi keep-alive dipakai ulang dan setiap panggilan
+dibatasi waktu. Respons `SessionClient` membawa kode status HTTP, sehingga
+gangguan layanan (5xx, error koneksi) bisa dibedakan dari error model
+(parameter salah, output kosong) lewat `is_outage`.
+"""
+import json
+import os
+import threading
+import time
+
+import requests
+from bytez import Bytez
+from bytez.client import Client, Response
+from requests.adapters import HTTPAdapter
+
+from instrumentation import stage
+
+
+class UpstreamResponse(Response):
+    """`Response` SDK ditambah kode status HTTP dari Bytez (`status`)."""
+
+    def __new__(cls, output=None, error=None, provider=None, status=None):
+        self = super().__new__(cls, output, error, provider)
+        self.status = status
+        return self
+
+
+def is_outage(outcome):
+    """
+    Apakah hasil gagal (respons atau exception) menandakan Bytez bermasalah,
+    sehingga perlu dihitung oleh circuit breaker.
+
+    Hanya HTTP 5xx dan kegagalan tanpa status HTTP (exception koneksi/timeout,
+    atau respons klien SDK bawaan yang membungkus error koneksi) yang dihitung.
+    Error model seperti parameter tidak valid (4xx) atau output kosong tidak.
+    """
+    status = getattr(outcome, 'status', None)
+    return status is None or status >= 500
+
+
+def _iter_text(response):
+    """Potongan teks stream apa adanya (termasuk baris baru); koneksi dilepas saat ditutup."""
+    try:
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            if chunk:
+                yield chunk
+    finally:
+        response.close()
+
+
+class SessionClient(Client):
+    """
+    Pengganti `bytez.client.Client` yang memakai satu `requests.Session`
+    (koneksi dipakai ulang) dan timeout dari `timeout()` untuk setiap panggilan.
+
+    Berbeda dengan klien SDK, error koneksi dan timeout dilempar sebagai
+    exception `requests` (bukan dibungkus menjadi `Response(error=...)`),
+    supaya pool dan penjadwal bisa membedakannya dari error model.
+    """
+
+    def __init__(self, base, session, timeout):
+        self.headers = base.headers
+        self.host = base.host
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, path="", method="GET", post_body=None, provider_key=None):
+        stream = bool(post_body and post_body.get("stream"))
+        headers = self.headers if provider_key is None else {**self.headers, "provider-key": provider_key}
+        data = json.dumps({k: v for k, v in post_body.items() if v is not None}) if post_body else None
+        response = self.session.request(
+            method, self.host + path, headers=headers, data=data, stream=stream, timeout=self.timeout(),
+        )
+        if stream and response.ok:
+            response.encoding = "utf-8"
+            return _iter_text(response)
+        # Respons biasa, atau stream yang ditolak Bytez (body berisi JSON error)
+        try:
+            results = response.json()
+        except ValueError as error:
+            results = {'error': str(error) if response.ok else f"HTTP {response.status_code}"}
+        finally:
+            response.close()
+        if not isinstance(results, dict):
+            results = {'error': f"HTTP {response.status_code}"}
+        error = results.get('error')
+        if not error and not response.ok:
+            error = f"HTTP {response.status_code}"
+        return UpstreamResponse(output=results.get('output'), error=error, provider=results.get('provider'),
+                                status=response.status_code)
+
+
+class ModelPool:
+    """
+    Menyimpan satu klien `Bytez` dan handle model per nama model.
+
+    Handle dibuat sekali (atau saat warm-up), lalu dipakai ulang. Handle
+    yang melempar error atau gagal health check dibuang dan dibuat ulang
+    saat dipakai lagi.
+
+    `timeout` adalah (connect, read) dalam detik. Jika `deadline()` diberikan
+    dan mengembalikan sisa waktu request (detik), timeout baca dipersingkat
+    agar panggilan tidak melewati deadline tersebut.
+    """
+
+    def __init__(self, api_key, client_factory=Bytez, timeout=(5.0, 60.0), deadline=None,
+                 max_connections=16, health_interval=0):
+        self._api_key = api_key
+        self._client_factory = client_factory
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_connections = max_connections
+        self.health_interval = health_interval
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Mengosongkan pool (dipanggil saat init dan di proses anak setelah fork)."""
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._client = None
+        self._handles = {}
+        self._stats = {}
+        self._health_thread = None
+
+    def _model_stats(self, model_name):
+        return self._stats.setdefault(model_name, {
+            'created': 0,
+            'reused': 0,
+            'rebuilt': 0,
+            'build_seconds': 0.0,
+            'warm': False,
+            'healthy': None,
+        })
+
+    def _timeout(self):
+        connect, read = self.timeout
+        remaining = self.deadline() if self.deadline is not None else None
+        if remaining is not None:
+            read = max(min(read, remaining), 0.05)
+        return min(connect, read), read
+
+    def _get_client(self):
+        """Klien Bytez milik proses ini. Harus dipanggil dengan `self._lock` terkunci."""
+        if self._client is None:
+            with stage('client_init'):
+                client = self._client_factory(self._api_key)
+                base = getattr(client, '_client', None)
+                if isinstance(base, Client):
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    client._client = SessionClient(base, session, self._timeout)
+                self._client = client
+        return self._client
+
+    def _build(self, model_name, initialize=False):
+        """Membuat handle baru. Harus dipanggil dengan `self._lock` terkunci."""
+        started = time.perf_counter()
+        client = self._get_client()
+        with stage('model_handle'):
+            handle = client.model(model_name)
+            if initialize and hasattr(handle, '_initialize'):
+                # Lookup detail model (list/models) dilakukan di sini, bukan di request pertama.
+                handle._initialize()
+        stats = self._model_stats(model_name)
+        stats['created'] += 1
+        stats['build_seconds'] += time.perf_counter() - started
+        self._handles[model_name] = handle
+        return handle
+
+    def get(self, model_name):
+        """Mengembalikan handle model, membuatnya jika belum ada."""
+        with self._lock:
+            handle = self._handles.get(model_name)
+            if handle is None:
+                return self._build(model_name)
+            self._model_stats(model_name)['reused'] += 1
+            return handle
+
+    def invalidate(self, model_name):
+        """Membuang handle yang rusak supaya dibuat ulang pada pemakaian berikutnya."""
+        with self._lock:
+            if self._handles.pop(model_name, None) is not None:
+                self._model_stats(model_name)['rebuilt'] += 1
+
+    def run(self, model_name, *args, **kwargs):
+        """
+        Menjalankan `model.run` dengan handle dari pool.
+
+        Hanya koneksi yang gagal dibuka atau terputus (misalnya koneksi
+        keep-alive yang sudah ditutup server) yang dicoba sekali lagi, dengan
+        handle baru. Timeout dan error lain tidak diulang karena panggilan ke
+        Bytez berbayar dan bisa saja sudah diproses; untuk error selain
+        timeout, handle tetap dibuang agar dibuat ulang pada pemakaian berikutnya.
+        """
+        try:
+            return self.get(model_name).run(*args, **kwargs)
+        except requests.Timeout:
+            raise
+        except requests.ConnectionError:
+            self.invalidate(model_name)
+            return self.get(model_name).run(*args, **kwargs)
+        except Exception:
+            self.invalidate(model_name)
+            raise
+
+    def health_check(self, model_name):
+        """Memeriksa apakah Bytez masih mengenali model; hasilnya dicatat di statistik."""
+        try:
+            with self._lock:
+                client = self._get_client()
+            result = client.list.models({'modelId': model_name})
+            healthy = not getattr(result, 'error', None)
+        except Exception:
+            healthy = False
+        with self._lock:
+            self._model_stats(model_name)['healthy'] = healthy
+        if not healthy:
+            self.invalidate(model_name)
+        return healthy
+
+    def _check_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            with self._lock:
+                model_names = list(self._stats)
+            for model_name in model_names:
+                self.health_check(model_name)
+
+    def start_health_checks(self):
+        """Menjalankan `health_check` berkala (setiap `health_interval` detik) di thread latar belakang."""
+        with self._lock:
+            if self.health_interval <= 0 or self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(target=self._check_loop, name='bytez-health', daemon=True)
+            self._health_thread.start()
+
+    def warm(self, model_names):
+        """
+        Membuat dan menginisialisasi handle di awal, sebelum request pertama
+        masuk, lalu memulai health check berkala.
+        """
+        for model_name in model_names:
+            try:
+                with self._lock:
+                    handle = self._build(model_name, initialize=True)
+                    stats = self._model_stats(model_name)
+                    stats['warm'] = True
+                    # `details` kosong berarti lookup model ke Bytez gagal.
+                    stats['healthy'] = bool(getattr(handle, 'details', True))
+            except Exception:
+                # Warm-up tidak boleh menggagalkan start worker; handle dibuat ulang saat dipakai.
+                with self._lock:
+                    self._handles.pop(model_name, None)
+                    self._model_stats(model_name)['warm'] = False
+        self.start_health_checks()
+
+    def stats(self):
+        """Ringkasan isi pool dan perkiraan waktu yang dihemat karena handle dipakai ulang."""
+        with self._lock:
+            models = {}
+            for model_name, stats in self._stats.items():
+                created = stats['created']
+                avg_build = stats['build_seconds'] / created if created else 0.0
+                models[model_name] = dict(
+                    stats,
+                    avg_build_ms=round(avg_build * 1000, 3),
+                    est_saved_ms=round(avg_build * stats['reused'] * 1000, 3),
+                )
+            return {
+                'pid': self._pid,
+                'size': len(self._handles),
+                'models': models,
+            }
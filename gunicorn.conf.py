@@ -0,0 +1,58 @@
+# Konfigurasi tambahan gunicorn (dibaca otomatis dari direktori kerja).
+# Opsi di Procfile (-w, --timeout) tetap berlaku dan menimpa nilai di sini.
+import os
+import shutil
+import tempfile
+
+# Metrik Prometheus digabung antar worker lewat file di direktori ini.
+# Harus di-set sebelum aplikasi (dan prometheus_client) di-import oleh worker.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "gemini-flask-metrics"),
+)
+
+
+def on_starting(server):
+    """
+    Mengosongkan metrik dari run sebelumnya saat master gunicorn mulai.
+    """
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """
+    Warm-up pool Bytez dan indeks dokumen di setiap worker setelah fork,
+    sebelum menerima request. Kegagalan warm-up hanya dicatat; worker tetap
+    berjalan dan mencoba lagi saat request pertama.
+    """
+    from app import MODEL_NAME, document_index, model_pool
+
+    try:
+        model_pool.warm([MODEL_NAME])
+    except Exception:
+        worker.log.exception("Warm-up pool Bytez gagal")
+    try:
+        document_index.start()
+    except Exception:
+        worker.log.exception("Indeks dokumen gagal dimuat")
+
+
+def worker_exit(server, worker):
+    """
+    Menulis sisa antrean log request sebelum worker berhenti.
+    """
+    from app import request_logger
+
+    if request_logger is not None:
+        request_logger.close()
+
+
+def child_exit(server, worker):
+    """
+    Menandai worker yang berhenti agar gauge in-flight miliknya tidak dihitung lagi.
+    """
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
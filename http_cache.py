@@ -0,0 +1,80 @@
+"""
+Cache tingkat HTTP untuk halaman hasil generasi: ETag yang diturunkan dari
+(model, prompt, hash output), cache byte HTML yang sudah dirender (dan sudah
+dikompres), serta negosiasi kompresi gzip/brotli.
+
+Brotli opsional: dipakai hanya jika paket `brotli` terpasang.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli opsional
+    brotli = None
+
+
+def make_etag(model_name, prompt, output, encoding='identity'):
+    """
+    ETag kuat untuk satu hasil. Setiap encoding punya tag sendiri karena
+    byte yang dikirim berbeda.
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, prompt, str(output)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    tag = digest.hexdigest()[:32]
+    return tag if encoding == 'identity' else f"{tag}-{encoding}"
+
+
+def supported_encodings():
+    return (['br'] if brotli is not None else []) + ['gzip', 'identity']
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+class PageCache:
+    """Cache LRU byte halaman per (ETag, encoding), dibatasi total ukuran."""
+
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self._bytes = 0
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, etag):
+        with self._lock:
+            body = self._pages.get(etag)
+            if body is None:
+                self._counters['misses'] += 1
+                return None
+            self._pages.move_to_end(etag)
+            self._counters['hits'] += 1
+            return body
+
+    def put(self, etag, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._pages.pop(etag, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._pages[etag] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._pages.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._counters['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._pages), bytes=self._bytes)
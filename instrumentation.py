@@ -0,0 +1,176 @@
+"""
+Instrumentasi jalur request: latensi per tahap, header `Server-Timing`,
+metrik Prometheus untuk `/metrics`, dan profiler sampling opsional untuk
+request yang lambat.
+
+Jika `PROMETHEUS_MULTIPROC_DIR` di-set (lihat gunicorn.conf.py), metrik dari
+semua worker gunicorn digabung saat `/metrics` dibaca.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter as PromCounter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUEST_LATENCY = Histogram(
+    'app_request_latency_seconds', "Latensi request HTTP", ['route', 'status'], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    'bytez_upstream_latency_seconds', "Latensi panggilan model.run ke Bytez", ['model', 'outcome'],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    'app_stage_latency_seconds', "Latensi per tahap di jalur request", ['stage'], buckets=LATENCY_BUCKETS,
+)
+ERRORS = PromCounter('app_errors_total', "Jumlah error per kelas", ['error_class'])
+RESPONSE_SIZE = Histogram('app_response_size_bytes', "Ukuran body respons", ['route'], buckets=SIZE_BUCKETS)
+IN_FLIGHT = Gauge('app_in_flight_requests', "Request yang sedang diproses", multiprocess_mode='livesum')
+
+_timings = contextvars.ContextVar('timings', default=None)
+_notes = contextvars.ContextVar('notes', default=None)
+
+
+def begin_request():
+    """Menyiapkan penampung timing untuk request di thread/konteks ini."""
+    _timings.set({})
+    _notes.set({})
+
+
+@contextmanager
+def stage(name):
+    """Mengukur satu tahap; dicatat ke histogram dan ke Server-Timing request aktif."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.labels(name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def annotate(name, description):
+    """Menambahkan keterangan ke Server-Timing (misalnya `cache;desc="hit"`)."""
+    notes = _notes.get()
+    if notes is not None:
+        notes[name] = description
+
+
+def record_error(error_class):
+    ERRORS.labels(error_class).inc()
+
+
+def timed_upstream(model_name, run, is_success):
+    """Menjalankan `run()` ke Bytez sebagai tahap 'model_run' dan mencatat latensi upstream."""
+    started = time.perf_counter()
+    outcome = 'exception'
+    try:
+        with stage('model_run'):
+            response = run()
+        outcome = 'ok' if is_success(response) else 'error'
+        return response
+    finally:
+        UPSTREAM_LATENCY.labels(model_name, outcome).observe(time.perf_counter() - started)
+
+
+def server_timing(total):
+    """Nilai header Server-Timing untuk request aktif (durasi dalam milidetik)."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in (_timings.get() or {}).items()]
+    parts.extend(f'{name};desc="{desc}"' for name, desc in (_notes.get() or {}).items())
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_metrics():
+    """Mengembalikan (body, content_type) untuk endpoint /metrics."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class SlowRequestProfiler:
+    """
+    Profiler sampling untuk request lambat. Satu thread latar belakang mengambil
+    stack thread request setiap `interval_ms`, tetapi hanya setelah request
+    melewati `threshold_ms`, sehingga request normal hampir tanpa overhead.
+    Hasilnya ditulis dalam format "folded stacks" (untuk flamegraph.pl/speedscope).
+    """
+
+    def __init__(self, threshold_ms, out_dir, interval_ms=5):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.out_dir = out_dir
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._active = {}  # thread ident -> (mulai, Counter stack)
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='slow-profiler', daemon=True)
+            self._thread.start()
+
+    def begin(self):
+        with self._lock:
+            self._ensure_thread()
+            self._active[threading.get_ident()] = (time.perf_counter(), Counter())
+
+    def end(self, route):
+        with self._lock:
+            entry = self._active.pop(threading.get_ident(), None)
+        if entry is None:
+            return None
+        started, stacks = entry
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold or not stacks:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = route.strip('/').replace('/', '_') or 'index'
+        path = os.path.join(self.out_dir, f"{time.time():.3f}-{os.getpid()}-{name}-{elapsed * 1000:.0f}ms.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.items():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, (started, stacks) in self._active.items():
+                    if ident == own or now - started < self.threshold:
+                        continue
+                    frame = frames.get(ident)
+                    names = []
+                    while frame is not None:
+                        code = frame.f_code
+                        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    if names:
+                        stacks[';'.join(reversed(names))] += 1
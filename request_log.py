@@ -0,0 +1,203 @@
+"""
+Logger request/respons append-only ke file JSONL yang tidak memblokir request.
+
+Record dimasukkan ke antrean di memori lalu ditulis per batch oleh thread
+latar belakang. Jika antrean hampir penuh, record di-sampling; jika penuh,
+record dibuang (dan dihitung) sehingga request tidak pernah menunggu disk.
+Penulisan dan rotasi dikunci dengan `flock`, jadi beberapa worker gunicorn
+bisa berbagi satu file log.
+"""
+import gzip
+import json
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # selain POSIX: tanpa kunci antar proses
+    fcntl = None
+
+_STOP = object()
+
+
+class RequestLogger:
+    """
+    `fsync_policy`: 'never', 'batch' (setiap flush), atau 'interval'
+    (paling sering sekali per `fsync_interval` detik).
+    """
+
+    def __init__(self, path, max_queue=10000, flush_records=200, flush_interval=1.0,
+                 fsync_policy='interval', fsync_interval=5.0, rotate_bytes=50 * 1024 * 1024,
+                 backups=5, compress=True, high_water=0.8, sample_rate=0.1):
+        self.path = path
+        self.max_queue = max_queue
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.rotate_bytes = rotate_bytes
+        self.backups = backups
+        self.compress = compress
+        self.high_water = int(max_queue * high_water)
+        self.sample_rate = sample_rate
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Antrean dan thread baru (saat init dan di proses anak setelah fork)."""
+        self._queue = queue.Queue(self.max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._last_fsync = time.monotonic()
+        self._counters = {
+            'logged': 0,
+            'written': 0,
+            'sampled_out': 0,
+            'dropped': 0,
+            'flushes': 0,
+            'rotations': 0,
+            'write_errors': 0,
+            'compress_errors': 0,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-log', daemon=True)
+                self._thread.start()
+
+    def log(self, record):
+        """Memasukkan record ke antrean tanpa pernah memblokir."""
+        if self._closed:
+            return
+        self._ensure_thread()
+        if self._queue.qsize() >= self.high_water and random.random() >= self.sample_rate:
+            self._counters['sampled_out'] += 1
+            return
+        try:
+            self._queue.put_nowait(record)
+            self._counters['logged'] += 1
+        except queue.Full:
+            self._counters['dropped'] += 1
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            if item is not None and not stop:
+                batch.append(item)
+            if stop or len(batch) >= self.flush_records or time.monotonic() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+            if stop:
+                return
+
+    def _open_locked(self):
+        """Membuka file log dengan kunci eksklusif, memastikan bukan file yang baru dirotasi."""
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    return fd
+            except OSError:
+                pass
+            os.close(fd)
+
+    def _flush(self, batch):
+        data = ''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in batch)
+        rotated = None
+        try:
+            fd = self._open_locked()
+            try:
+                os.write(fd, data.encode('utf-8'))
+                now = time.monotonic()
+                if self.fsync_policy == 'batch' or (
+                        self.fsync_policy == 'interval' and now - self._last_fsync >= self.fsync_interval):
+                    os.fsync(fd)
+                    self._last_fsync = now
+                if self.rotate_bytes and os.fstat(fd).st_size >= self.rotate_bytes:
+                    rotated = self._rotate()
+            finally:
+                os.close(fd)
+        except OSError:
+            self._counters['write_errors'] += 1
+            return
+        self._counters['written'] += len(batch)
+        self._counters['flushes'] += 1
+        if rotated is not None:
+            self._compress(rotated)
+
+    def _rotate(self):
+        """
+        Rotasi berbasis ukuran; dipanggil sambil memegang kunci file log.
+        Mengembalikan path file yang masih perlu dikompres (atau None).
+        """
+        suffix = '.gz' if self.compress else ''
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}{suffix}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}{suffix}")
+        self._counters['rotations'] += 1
+        if not self.compress:
+            os.replace(self.path, f"{self.path}.1")
+            return None
+        pending = f"{self.path}.1.{os.getpid()}.tmp"
+        os.replace(self.path, pending)
+        return pending
+
+    def _compress(self, pending):
+        """
+        Kompresi gzip di luar kunci supaya worker lain tidak ikut menunggu.
+        Jika gagal, file hasil rotasi disimpan tanpa kompresi sebagai `<path>.1`
+        dan dihitung di `compress_errors`; batch yang sudah tertulis tetap sah.
+        """
+        partial = f"{pending}.gz"
+        try:
+            with open(pending, 'rb') as src, gzip.open(partial, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(partial, f"{self.path}.1.gz")
+            os.remove(pending)
+        except OSError:
+            self._counters['compress_errors'] += 1
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            try:
+                os.replace(pending, f"{self.path}.1")
+            except OSError:
+                pass
+
+    def close(self, timeout=5.0):
+        """Menulis semua record yang tersisa lalu menghentikan thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        return dict(self._counters, queued=self._queue.qsize(), path=self.path)
@@ -0,0 +1,317 @@
+"""
+Cache hasil `model.run` (LRU + TTL) dengan deduplikasi request yang sedang berjalan.
+
+Hanya respons sukses (ada output, tanpa error) yang disimpan. Request identik
+yang datang bersamaan menunggu satu panggilan ke Bytez (single-flight).
+Backend disk opsional membuat cache bertahan saat worker gunicorn di-restart.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def is_success(response):
+    """Respons dianggap sukses jika berisi output dan tidak membawa error."""
+    try:
+        return len(response) >= 2 and bool(response[0]) and not response[1]
+    except TypeError:
+        return False
+
+
+def make_key(model_name, prompt, params=None):
+    """Kunci cache stabil dari (model, prompt, parameter generasi)."""
+    raw = json.dumps([model_name, prompt, params], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class FlightTimeout(Exception):
+    """Hasil panggilan yang sedang berjalan tidak selesai dalam batas waktu penunggu."""
+
+
+class _Flight:
+    """Panggilan yang sedang berjalan; pemanggil lain menunggu hasilnya."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc = None
+
+
+class DiskStore:
+    """
+    Penyimpanan satu file JSON per kunci. Penulisan atomik (tulis ke file
+    sementara lalu `os.replace`) sehingga aman dipakai beberapa worker.
+
+    Pemangkasan ke `max_entries` tidak dilakukan di setiap penulisan, tetapi
+    paling sering sekali per `prune_interval` detik; di antaranya jumlah file
+    bisa sedikit melebihi batas.
+    """
+
+    def __init__(self, directory, max_entries=None, prune_interval=60.0):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self._prune_lock = threading.Lock()
+        self._last_prune = float('-inf')
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires', 0) <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return tuple(entry['response']), entry['expires']
+
+    def set(self, key, response, expires):
+        """Menulis satu entri. Kegagalan disk diabaikan (cache memori tetap dipakai)."""
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'response': list(response), 'expires': expires}, f)
+            os.replace(tmp, self._path(key))
+        except (OSError, TypeError, ValueError):
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            return
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        """Menjalankan `_prune` paling sering sekali per `prune_interval` detik."""
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_prune = now
+            self._prune()
+        finally:
+            self._prune_lock.release()
+
+    def _prune(self):
+        """Membuang file tertua jika jumlah entri melebihi batas."""
+        if not self.max_entries:
+            return
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        dated = []
+        for entry in entries:
+            try:
+                dated.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                # Sudah dihapus worker lain (misalnya entri kedaluwarsa)
+                continue
+        if len(dated) <= self.max_entries:
+            return
+        dated.sort()
+        for _, path in dated[:len(dated) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class ResultCache:
+    """
+    Cache LRU di memori dengan batas jumlah entri dan perkiraan ukuran (byte),
+    plus TTL per entri.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=8 * 1024 * 1024, ttl=300, disk_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = DiskStore(disk_dir, max_entries * 4) if disk_dir else None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (response, expires, size)
+        self._flights = {}
+        self._bytes = 0
+        self._counters = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'stale_hits': 0,
+            'stored': 0,
+            'not_stored': 0,
+        }
+
+    @staticmethod
+    def _size(response):
+        return sum(len(str(value)) for value in response)
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _store(self, key, response, expires):
+        """
+        Menyimpan ke memori dan mengevict entri LRU. Harus dengan `self._lock`
+        terkunci. Mengembalikan False jika entri terlalu besar untuk disimpan.
+        """
+        size = self._size(response)
+        if size > self.max_bytes:
+            return False
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (response, expires, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self._counters['evictions'] += 1
+        return True
+
+    def _lookup(self, key, stale=False, count_expired=True):
+        """
+        Mencari di memori. Harus dengan `self._lock` terkunci.
+        Entri kedaluwarsa tetap disimpan (sampai tergeser LRU) supaya bisa
+        dipakai sebagai hasil cadangan saat Bytez tidak tersedia (`stale=True`).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, expires, _ = entry
+        if expires > time.time():
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return response
+        if stale:
+            self._counters['stale_hits'] += 1
+            return response
+        if count_expired:
+            self._counters['expirations'] += 1
+        return None
+
+    def _load_disk(self, key):
+        """Mencari di disk (di luar `self._lock`) dan memasukkan hasilnya ke memori."""
+        if self.disk is None:
+            return None
+        found = self.disk.get(key)
+        if found is None:
+            return None
+        response, expires = found
+        with self._lock:
+            self._store(key, response, expires)
+            self._counters['disk_hits'] += 1
+        return response
+
+    def _save(self, key, response):
+        """Menyimpan hasil sukses ke memori lalu ke disk (di luar `self._lock`)."""
+        response = tuple(response)
+        expires = time.time() + self.ttl
+        with self._lock:
+            stored = self._store(key, response, expires)
+            self._counters['stored' if stored else 'not_stored'] += 1
+        if stored and self.disk is not None:
+            self.disk.set(key, response, expires)
+        return stored
+
+    def get_or_run(self, model_name, prompt, params, run, wait_timeout=None):
+        """
+        Mengembalikan `(response, status)` dengan status 'hit', 'miss' atau
+        'coalesced'. `run()` hanya dipanggil sekali untuk request identik yang
+        datang bersamaan; exception-nya diteruskan ke semua yang menunggu.
+
+        Penunggu memakai batas waktunya sendiri (`wait_timeout` detik), bukan
+        milik pemanggil pertama; jika habis, FlightTimeout dilempar.
+        """
+        key = make_key(model_name, prompt, params)
+        with self._lock:
+            cached = self._lookup(key)
+            in_flight = key in self._flights
+        if cached is not None:
+            return cached, 'hit'
+        if not in_flight:
+            cached = self._load_disk(key)
+            if cached is not None:
+                return cached, 'hit'
+
+        with self._lock:
+            # Pemanggil pertama sebelumnya mungkin baru selesai menyimpan hasil
+            cached = self._lookup(key, count_expired=False)
+            if cached is not None:
+                return cached, 'hit'
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._counters['misses'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            if not flight.done.wait(wait_timeout):
+                raise FlightTimeout("Batas waktu habis saat menunggu hasil request yang sama.")
+            if flight.exc is not None:
+                raise flight.exc
+            return flight.result, 'coalesced'
+
+        try:
+            flight.result = run()
+        except Exception as e:
+            flight.exc = e
+            raise
+        finally:
+            # Penunggu selalu dilepas, walaupun penyimpanan ke cache gagal
+            try:
+                if flight.exc is None and is_success(flight.result):
+                    self._save(key, flight.result)
+                elif flight.exc is None:
+                    with self._lock:
+                        self._counters['not_stored'] += 1
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        return flight.result, 'miss'
+
+    def put(self, model_name, prompt, params, response):
+        """Menyimpan hasil yang didapat di luar `get_or_run`."""
+        if not is_success(response):
+            return False
+        return self._save(make_key(model_name, prompt, params), response)
+
+    def peek(self, model_name, prompt, params=None, stale=False):
+        """
+        Mengambil hasil yang sudah ada di cache tanpa memanggil Bytez (None jika
+        tidak ada). Dengan `stale=True`, hasil yang sudah kedaluwarsa juga dikembalikan.
+        """
+        key = make_key(model_name, prompt, params)
+        with self._lock:
+            cached = self._lookup(key, stale)
+        if cached is not None:
+            return cached
+        return self._load_disk(key)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counters,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                in_flight=len(self._flights),
+                disk=self.disk.directory if self.disk is not None else None,
+            )
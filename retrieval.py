@@ -0,0 +1,519 @@
+"""
+Retrieval sederhana untuk RAG: dokumen dipecah menjadi potongan (chunk),
+diindeks dengan inverted index BM25, lalu potongan yang relevan disisipkan
+ke prompt sebelum dikirim ke Bytez.
+
+Indeks disimpan dalam satu file biner:
+
+    b'RAG1' | uint32 panjang meta | meta JSON | padding | array uint32/float32
+
+Hanya array angka (postings, panjang potongan, embedding) yang dibaca lewat
+mmap tanpa disalin. Meta JSON, termasuk teks potongan dan kamus term, di-parse
+utuh ke memori setiap kali indeks dimuat, sehingga memori per worker tetap
+sebanding dengan ukuran korpus. Jika NumPy tersedia, skor BM25 dihitung
+tervektorisasi di atas array mmap tersebut.
+
+Penulisan memakai file sementara + `os.replace`, jadi worker lain yang masih
+memegang mmap lama tetap aman. Indeks hanya dibangun ulang jika isi file
+berubah (mtime/ukuran lalu hash); potongan dan embedding dari file yang tidak
+berubah dipakai ulang. Pemeriksaan dan pembangunan berjalan di thread latar
+belakang, bukan di jalur request, dan dikunci antar worker dengan `flock`
+sehingga hanya satu worker yang membangun. Jika file indeks tidak bisa
+ditulis, indeks tetap dipakai dari memori.
+
+Pencarian embedding (opsional) memakai NumPy dengan vektor hashing
+bag-of-words; jika NumPy tidak terpasang, hanya BM25 yang tersedia.
+"""
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # selain POSIX: tanpa kunci antar proses
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:  # NumPy opsional
+    np = None
+
+MAGIC = b'RAG1'
+CHUNK_CHARS = 800
+EMBEDDING_DIM = 256
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def chunk_document(text, max_chars=CHUNK_CHARS):
+    """Menggabungkan paragraf menjadi potongan hingga `max_chars` karakter."""
+    chunks = []
+    current = ''
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def embed_tokens(tokens, dim=EMBEDDING_DIM):
+    """Vektor hashing bag-of-words yang dinormalisasi (butuh NumPy)."""
+    hashes = np.array([zlib.crc32(t.encode('utf-8')) for t in tokens], dtype=np.uint32)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    vector = np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Snapshot:
+    """Indeks yang sudah dimuat (read-only); diganti utuh saat indeks diperbarui."""
+
+    def __init__(self, meta, buffer):
+        self.meta = meta
+        self.files = meta['files']
+        self.chunks = meta['chunks']
+        self.terms = meta['terms']
+        self.avgdl = meta['avgdl'] or 1.0
+        self._buffer = buffer
+        view = memoryview(buffer)
+        arrays = meta['arrays']
+
+        def section(name, fmt):
+            offset, length = arrays[name]
+            return view[offset:offset + length * 4].cast(fmt)
+
+        self.chunk_len = section('chunk_len', 'I')
+        self.post_doc = section('post_doc', 'I')
+        self.post_tf = section('post_tf', 'I')
+        if np is not None:
+            # View NumPy langsung di atas mmap (tanpa salinan) untuk skor BM25 tervektorisasi
+            self._np_doc = np.frombuffer(self.post_doc, dtype=np.uint32)
+            self._np_tf = np.frombuffer(self.post_tf, dtype=np.uint32).astype(np.float32)
+            chunk_len = np.frombuffer(self.chunk_len, dtype=np.uint32)
+            self._np_norm = (BM25_K1 * (1 - BM25_B + BM25_B * chunk_len / self.avgdl)).astype(np.float32)
+        self.embeddings = None
+        if np is not None and meta.get('dim'):
+            offset, length = arrays['embeddings']
+            self.embeddings = np.frombuffer(
+                buffer, dtype=np.float32, count=length, offset=offset,
+            ).reshape(-1, meta['dim'])
+
+    def bm25(self, query_tokens, k):
+        if np is None:
+            return self._bm25_python(query_tokens, k)
+        n = len(self.chunks)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(query_tokens):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            docs = self._np_doc[offset:offset + df]
+            tf = self._np_tf[offset:offset + df]
+            # Satu term muncul paling banyak sekali per potongan, jadi indeks `docs` unik
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + self._np_norm[docs])
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(int(doc), float(scores[doc])) for doc in matched]
+
+    def _bm25_python(self, query_tokens, k):
+        n = len(self.chunks)
+        scores = {}
+        for term in set(query_tokens):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for i in range(offset, offset + df):
+                doc = self.post_doc[i]
+                tf = self.post_tf[i]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_len[doc] / self.avgdl)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def embedding(self, query_tokens, k):
+        if self.embeddings is None or not len(self.embeddings):
+            return []
+        similarity = self.embeddings @ embed_tokens(query_tokens, self.meta['dim'])
+        k = min(k, len(similarity))
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top])]
+        return [(int(i), float(similarity[i])) for i in top if similarity[i] > 0]
+
+
+def _encode_index(files, chunks, with_embeddings, vectors=None):
+    """
+    Membangun postings dari potongan teks dan mengembalikan isi file indeks.
+    `vectors` (opsional) berisi embedding yang sudah ada per potongan (atau None).
+    """
+    postings = {}
+    chunk_len = array('I')
+    chunk_tokens = [tokenize(chunk['text']) for chunk in chunks]
+    for doc, tokens in enumerate(chunk_tokens):
+        chunk_len.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    post_doc = array('I')
+    post_tf = array('I')
+    terms = {}
+    for term in sorted(postings):
+        terms[term] = (len(post_doc), len(postings[term]))
+        for doc, tf in postings[term]:
+            post_doc.append(doc)
+            post_tf.append(tf)
+
+    dim = EMBEDDING_DIM if with_embeddings and np is not None else 0
+    sections = [('chunk_len', chunk_len.tobytes(), len(chunk_len)),
+                ('post_doc', post_doc.tobytes(), len(post_doc)),
+                ('post_tf', post_tf.tobytes(), len(post_tf))]
+    if dim:
+        vectors = vectors or [None] * len(chunks)
+        matrix = np.stack([
+            vector if vector is not None else embed_tokens(tokens, dim)
+            for vector, tokens in zip(vectors, chunk_tokens)
+        ]) if chunks else np.zeros((0, dim), dtype=np.float32)
+        sections.append(('embeddings', matrix.astype(np.float32).tobytes(), matrix.size))
+
+    meta = {
+        'files': files,
+        'chunks': chunks,
+        'terms': terms,
+        'avgdl': sum(chunk_len) / len(chunk_len) if chunk_len else 0.0,
+        'dim': dim,
+        'arrays': {},
+    }
+    # Offset array bergantung pada panjang meta, jadi hitung ulang sampai stabil
+    while True:
+        header = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+        offset = len(MAGIC) + 4 + len(header)
+        offset += -offset % 4
+        arrays = {}
+        for name, data, length in sections:
+            arrays[name] = [offset, length]
+            offset += len(data)
+        if arrays == meta['arrays']:
+            break
+        meta['arrays'] = arrays
+
+    parts = [MAGIC + struct.pack('<I', len(header)) + header, b'\0' * (-(len(MAGIC) + 4 + len(header)) % 4)]
+    parts.extend(data for _, data, _ in sections)
+    return b''.join(parts)
+
+
+def _write_index(path, data):
+    """Menulis file indeks secara atomik."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _parse_index(buffer):
+    if buffer[:len(MAGIC)] != MAGIC:
+        return None
+    (meta_len,) = struct.unpack_from('<I', buffer, len(MAGIC))
+    start = len(MAGIC) + 4
+    meta = json.loads(bytes(buffer[start:start + meta_len]).decode('utf-8'))
+    return _Snapshot(meta, buffer)
+
+
+def _read_index(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    snapshot = _parse_index(buffer)
+    if snapshot is None:
+        buffer.close()
+    return snapshot
+
+
+class DocumentIndex:
+    """
+    Indeks dokumen untuk RAG. `start()` menjalankan `refresh()` di thread latar
+    belakang setiap `refresh_interval` detik; `search()` dipanggil per request
+    dan hanya membaca snapshot terakhir, tidak pernah membangun indeks.
+    """
+
+    def __init__(self, index_path, paths=(), directory=None, refresh_interval=30,
+                 with_embeddings=True):
+        self.index_path = index_path
+        self.paths = list(paths)
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.with_embeddings = with_embeddings
+        self._snapshot = None
+        self._disk_version = None
+        self._hashes = {}  # path -> ((mtime_ns, size), sha256) untuk file yang di-hash ulang
+        self._counters = {'checks': 0, 'rebuilds': 0, 'reloads': 0, 'write_errors': 0, 'errors': 0}
+        self._last_error = None
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Kunci dan thread baru (saat init dan di proses anak setelah fork)."""
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _source_files(self):
+        files = [p for p in self.paths if os.path.isfile(p)]
+        if self.directory and os.path.isdir(self.directory):
+            for root, _, names in os.walk(self.directory):
+                for name in sorted(names):
+                    if name.endswith(('.txt', '.md')):
+                        files.append(os.path.join(root, name))
+        return sorted(set(files))
+
+    @contextmanager
+    def _build_lock(self):
+        """Kunci antar worker selama memeriksa dan menulis indeks."""
+        fd = None
+        if fcntl is not None:
+            try:
+                fd = os.open(self.index_path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except OSError:
+                if fd is not None:
+                    os.close(fd)
+                fd = None
+        try:
+            yield
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _reload(self):
+        """Memuat indeks dari disk jika file indeks berubah (mungkin ditulis worker lain)."""
+        try:
+            st = os.stat(self.index_path)
+        except OSError:
+            return False
+        disk_version = (st.st_ino, st.st_mtime_ns)
+        if disk_version == self._disk_version:
+            return False
+        self._disk_version = disk_version
+        try:
+            snapshot = _read_index(self.index_path)
+        except (OSError, ValueError, KeyError):
+            snapshot = None
+        if snapshot is None:
+            return False
+        self._snapshot = snapshot
+        self._counters['reloads'] += 1
+        return True
+
+    def _scan(self, snapshot):
+        """Mengembalikan (metadata file sumber, apakah isinya berbeda dari `snapshot`)."""
+        old_files = snapshot.files if snapshot is not None else {}
+        files = {}
+        for path in self._source_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signature = (st.st_mtime_ns, st.st_size)
+            previous = old_files.get(path)
+            known = self._hashes.get(path)
+            if previous and (previous['mtime_ns'], previous['size']) == signature:
+                digest = previous['sha256']
+            elif known is not None and known[0] == signature:
+                digest = known[1]
+            else:
+                digest = _file_hash(path)
+                self._hashes[path] = (signature, digest)
+            files[path] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': digest}
+
+        # Hanya isi (hash) yang menentukan; mtime baru saja tidak memicu penulisan ulang
+        changed = snapshot is None or \
+            {p: f['sha256'] for p, f in files.items()} != {p: f['sha256'] for p, f in old_files.items()}
+        if snapshot is not None and bool(snapshot.meta.get('dim')) != (self.with_embeddings and np is not None):
+            changed = True
+        return files, changed
+
+    def _rebuild(self, files):
+        snapshot = self._snapshot
+        old_files = snapshot.files if snapshot is not None else {}
+        reused = {}
+        if snapshot is not None:
+            for i, chunk in enumerate(snapshot.chunks):
+                path = chunk['file']
+                if path in files and files[path]['sha256'] == old_files[path]['sha256']:
+                    vector = snapshot.embeddings[i] if snapshot.embeddings is not None else None
+                    reused.setdefault(path, []).append((chunk, vector))
+
+        chunks = []
+        vectors = []
+        for path in files:
+            if path in reused:
+                for chunk, vector in reused[path]:
+                    chunks.append(chunk)
+                    vectors.append(vector)
+                continue
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            for text_chunk in chunk_document(text):
+                chunks.append({'file': path, 'text': text_chunk})
+                vectors.append(None)
+
+        data = _encode_index(files, chunks, self.with_embeddings, vectors)
+        self._counters['rebuilds'] += 1
+        try:
+            _write_index(self.index_path, data)
+        except OSError as e:
+            # Lokasi indeks tidak bisa ditulis: tetap layani dari memori
+            self._counters['write_errors'] += 1
+            self._last_error = f"{type(e).__name__}: {e}"
+            self._snapshot = _parse_index(data)
+            return
+        self._snapshot = _read_index(self.index_path)
+        st = os.stat(self.index_path)
+        self._disk_version = (st.st_ino, st.st_mtime_ns)
+
+    def refresh(self):
+        """
+        Memuat indeks dari disk dan membangunnya ulang jika isi file sumber
+        berubah. Mengembalikan True jika indeks dibangun ulang oleh worker ini.
+        """
+        with self._lock:
+            self._counters['checks'] += 1
+            self._reload()
+            files, changed = self._scan(self._snapshot)
+            if not changed:
+                return False
+            with self._build_lock():
+                # Worker lain mungkin baru saja selesai membangun indeks yang sama
+                if self._reload():
+                    files, changed = self._scan(self._snapshot)
+                    if not changed:
+                        return False
+                self._rebuild(files)
+            return True
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self._counters['errors'] += 1
+                self._last_error = f"{type(e).__name__}: {e}"
+            time.sleep(self.refresh_interval)
+
+    def start(self):
+        """
+        Memuat indeks yang sudah ada di disk (jika ada) lalu memulai thread
+        pembaruan. Aman dipanggil berulang kali; error tidak dilempar.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            try:
+                self._reload()
+            except Exception as e:
+                self._counters['errors'] += 1
+                self._last_error = f"{type(e).__name__}: {e}"
+            self._thread = threading.Thread(target=self._refresh_loop, name='rag-refresh', daemon=True)
+            self._thread.start()
+
+    def _current(self):
+        if self._thread is None:
+            self.start()
+        return self._snapshot
+
+    def search(self, query, k=3, method='bm25'):
+        """
+        Mengembalikan daftar `{file, text, score}` paling relevan.
+        `method`: 'bm25', 'embedding', atau 'hybrid' (gabungan keduanya).
+        Daftar kosong jika indeks belum siap.
+        """
+        snapshot = self._current()
+        if snapshot is None or not snapshot.chunks:
+            return []
+        tokens = tokenize(query)
+        if method == 'embedding' and snapshot.embeddings is not None:
+            hits = snapshot.embedding(tokens, k)
+        elif method == 'hybrid' and snapshot.embeddings is not None:
+            combined = {}
+            for rank_list in (snapshot.bm25(tokens, k * 2), snapshot.embedding(tokens, k * 2)):
+                for rank, (doc, _) in enumerate(rank_list):
+                    # Reciprocal rank fusion
+                    combined[doc] = combined.get(doc, 0.0) + 1.0 / (60 + rank)
+            hits = heapq.nlargest(k, combined.items(), key=lambda item: item[1])
+        else:
+            hits = snapshot.bm25(tokens, k)
+        return [
+            {'file': snapshot.chunks[doc]['file'], 'text': snapshot.chunks[doc]['text'], 'score': round(score, 4)}
+            for doc, score in hits
+        ]
+
+    def stats(self):
+        snapshot = self._snapshot
+        stats = dict(self._counters, loaded=snapshot is not None, last_error=self._last_error)
+        if snapshot is not None:
+            stats.update(
+                files=len(snapshot.files),
+                chunks=len(snapshot.chunks),
+                terms=len(snapshot.terms),
+                embeddings=snapshot.embeddings is not None,
+            )
+        return stats
+
+
+def build_prompt(question, passages):
+    """Menyisipkan potongan dokumen yang relevan sebelum pertanyaan pengguna."""
+    if not passages:
+        return question
+    context = "\n\n".join(f"[{i + 1}] {p['text']}" for i, p in enumerate(passages))
+    return f"Konteks:\n{context}\n\nPertanyaan: {question}\nJawaban:"
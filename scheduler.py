@@ -0,0 +1,335 @@
+"""
+Penjadwal panggilan ke Bytez: slot upstream terbatas dengan antrean prioritas,
+deadline per request, hedging untuk latensi ekor, dan circuit breaker.
+
+- Request interaktif (halaman) didahulukan dari request batch.
+- Request ditolak lebih awal (`Overloaded`) jika perkiraan waktu tunggu plus
+  latensi median sudah melewati deadline-nya.
+- Jika panggilan utama melewati p95 yang teramati dan masih ada slot kosong,
+  panggilan duplikat (hedge) dikirim; yang selesai duluan dipakai. Panggilan
+  yang kalah dibatalkan jika belum berjalan; jika sudah berjalan, hasilnya
+  diabaikan dan slotnya baru dilepas saat panggilan itu selesai.
+- Saat Bytez terus gagal, circuit breaker menolak panggilan (`CircuitOpen`)
+  sampai masa cooldown habis, lalu mencoba satu panggilan percobaan.
+- Deadline panggilan terlihat di thread upstream lewat `deadline_remaining()`
+  sehingga klien HTTP bisa memasang timeout yang sama. Panggilan yang
+  ditinggalkan karena deadline habis tetap memegang slot sampai selesai;
+  jika jumlahnya mencapai `max_abandoned`, breaker langsung dibuka.
+"""
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+BATCH = 1
+
+_deadline = contextvars.ContextVar('upstream_deadline', default=None)
+
+
+def deadline_remaining():
+    """Sisa waktu (detik) sampai deadline panggilan upstream yang sedang berjalan, atau None."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class SchedulerRejected(Exception):
+    """Panggilan tidak dijalankan oleh penjadwal."""
+
+
+class Overloaded(SchedulerRejected):
+    """Antrean terlalu panjang untuk memenuhi deadline request."""
+
+
+class DeadlineExceeded(SchedulerRejected):
+    """Deadline request habis sebelum Bytez selesai."""
+
+
+class CircuitOpen(SchedulerRejected):
+    """Circuit breaker terbuka karena Bytez sedang gagal."""
+
+
+class CircuitBreaker:
+    """Breaker sederhana: closed -> open (setelah N gagal beruntun) -> half_open -> closed."""
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._trial:
+                    return False
+                self._trial = True
+            return True
+
+    def trip(self):
+        """Membuka breaker sekarang juga, tanpa menunggu `threshold` kegagalan."""
+        with self._lock:
+            self._trial = False
+            self.state = 'open'
+            self._opened_at = time.monotonic()
+
+    def abort(self):
+        """Panggilan yang diizinkan ternyata tidak dijalankan (misalnya ditolak antrean)."""
+        with self._lock:
+            self._trial = False
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self._failures = 0
+                self.state = 'closed'
+                return
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.threshold:
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+
+class Scheduler:
+    def __init__(self, slots=8, hedge=True, hedge_min_samples=20, window=200,
+                 breaker_threshold=5, breaker_cooldown=30.0, max_abandoned=None):
+        self.slots = slots
+        self.max_abandoned = max_abandoned or min(slots, max(2, slots // 2))
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.window = window
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """State baru (saat init dan di proses anak setelah fork)."""
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._abandoned = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._latencies = deque(maxlen=self.window)
+        self._executor = None
+        self._counters = {
+            'admitted': 0,
+            'rejected_overload': 0,
+            'deadline_exceeded': 0,
+            'circuit_rejected': 0,
+            'hedged': 0,
+            'hedge_wins': 0,
+            'abandoned': 0,
+        }
+
+    def _get_executor(self):
+        with self._cond:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix='upstream')
+            return self._executor
+
+    def _percentile(self, p):
+        samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def _acquire(self, priority, deadline):
+        """Mengambil satu slot upstream sesuai prioritas, atau melempar SchedulerRejected."""
+        with self._cond:
+            if self._busy < self.slots and not self._waiters:
+                self._busy += 1
+                self._counters['admitted'] += 1
+                return
+
+            p50 = self._percentile(50)
+            if p50 is not None:
+                ahead = sum(1 for waiter in self._waiters if waiter[0] <= priority)
+                expected_wait = (ahead // self.slots + 1) * p50
+                if time.monotonic() + expected_wait + p50 > deadline:
+                    self._counters['rejected_overload'] += 1
+                    raise Overloaded("Antrean ke Bytez terlalu panjang, coba lagi nanti.")
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while self._waiters[0] is not entry or self._busy >= self.slots:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['deadline_exceeded'] += 1
+                        raise DeadlineExceeded("Batas waktu habis saat menunggu antrean Bytez.")
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiters)
+            self._busy += 1
+            self._counters['admitted'] += 1
+            self._cond.notify_all()
+
+    def _try_acquire(self):
+        with self._cond:
+            if self._busy < self.slots and not self._waiters:
+                self._busy += 1
+                return True
+            return False
+
+    def _release(self, *_):
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify_all()
+
+    def _submit(self, fn, deadline):
+        started = time.monotonic()
+        # Konteks disalin agar timing tahap tetap tercatat di request pemanggil
+        context = contextvars.copy_context()
+        context.run(_deadline.set, deadline)
+        future = self._get_executor().submit(context.run, fn)
+        future.add_done_callback(self._release)
+        future.started = started
+        return future
+
+    def _abandon(self, future):
+        """Mencatat panggilan yang masih berjalan setelah deadline-nya habis."""
+        with self._cond:
+            self._abandoned += 1
+            self._counters['abandoned'] += 1
+            trip = self._abandoned >= self.max_abandoned
+        future.add_done_callback(self._forget)
+        if trip:
+            self.breaker.trip()
+
+    def _forget(self, _):
+        with self._cond:
+            self._abandoned -= 1
+
+    def call(self, fn, priority, timeout, is_failure=lambda result: False, is_outage=lambda outcome: True):
+        """
+        Menjalankan `fn()` di slot upstream dalam batas `timeout` detik.
+        Melempar SchedulerRejected jika ditolak, atau exception dari `fn`.
+
+        Hasil yang `is_failure` diteruskan ke pemanggil, tetapi hanya dihitung
+        gagal oleh circuit breaker jika `is_outage(hasil atau exception)`.
+        Deadline yang terlewat selalu dihitung.
+        """
+        deadline = time.monotonic() + timeout
+        if not self.breaker.allow():
+            self._counters['circuit_rejected'] += 1
+            raise CircuitOpen("Bytez sedang bermasalah; permintaan dihentikan sementara.")
+        try:
+            self._acquire(priority, deadline)
+        except SchedulerRejected:
+            self.breaker.abort()
+            raise
+
+        futures = [self._submit(fn, deadline)]
+        hedge_after = None
+        with self._cond:
+            if self.hedge and len(self._latencies) >= self.hedge_min_samples:
+                hedge_after = self._percentile(95)
+
+        if hedge_after is not None:
+            done, _ = wait(futures, timeout=max(min(hedge_after, deadline - time.monotonic()), 0))
+            if not done and time.monotonic() < deadline and self._try_acquire():
+                futures.append(self._submit(fn, deadline))
+                self._counters['hedged'] += 1
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None and not is_failure(future.result()):
+                    for other in pending:
+                        other.cancel()
+                    if future is not futures[0]:
+                        self._counters['hedge_wins'] += 1
+                    with self._cond:
+                        self._latencies.append(time.monotonic() - future.started)
+                    self.breaker.record(True)
+                    return future.result()
+                error = future
+        for other in pending:
+            if not other.cancel():
+                self._abandon(other)
+
+        if error is None:
+            self.breaker.record(False)
+            self._counters['deadline_exceeded'] += 1
+            raise DeadlineExceeded(f"Bytez tidak merespons dalam {timeout:.0f} detik.")
+        outcome = error.exception() if error.exception() is not None else error.result()
+        if is_outage(outcome):
+            self.breaker.record(False)
+        else:
+            self.breaker.abort()
+        if error.exception() is not None:
+            raise error.exception()
+        # Respons gagal dari Bytez diteruskan apa adanya
+        return outcome
+
+    @contextmanager
+    def reserve(self, priority, timeout, is_outage=lambda exc: True):
+        """
+        Memegang satu slot selama blok berjalan (untuk streaming, tanpa hedging).
+        Hasil blok dicatat ke circuit breaker; klien terputus dan exception yang
+        bukan `is_outage(exc)` tidak dihitung gagal.
+        """
+        deadline = time.monotonic() + timeout
+        if not self.breaker.allow():
+            self._counters['circuit_rejected'] += 1
+            raise CircuitOpen("Bytez sedang bermasalah; permintaan dihentikan sementara.")
+        try:
+            self._acquire(priority, deadline)
+        except SchedulerRejected:
+            self.breaker.abort()
+            raise
+        ok = False
+        try:
+            yield
+            ok = True
+        except GeneratorExit:
+            ok = None
+            raise
+        except Exception as exc:
+            if not is_outage(exc):
+                ok = None
+            raise
+        finally:
+            self._release()
+            if ok is None:
+                self.breaker.abort()
+            else:
+                self.breaker.record(ok)
+
+    def stats(self):
+        with self._cond:
+            p50 = self._percentile(50)
+            p95 = self._percentile(95)
+            return dict(
+                self._counters,
+                slots=self.slots,
+                busy=self._busy,
+                abandoned_running=self._abandoned,
+                queued=len(self._waiters),
+                p50_ms=round(p50 * 1000, 1) if p50 is not None else None,
+                p95_ms=round(p95 * 1000, 1) if p95 is not None else None,
+                breaker=self.breaker.state,
+            )
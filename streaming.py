@@ -0,0 +1,59 @@
+"""
+Helper streaming hasil Bytez ke browser sebagai Server-Sent Events (SSE).
+"""
+import json
+
+from result_cache import is_success
+
+# Ukuran potongan teks saat SDK tidak mendukung streaming (fallback chunked)
+FALLBACK_CHUNK_CHARS = 64
+
+
+class UpstreamError(RuntimeError):
+    """Bytez menolak atau gagal menjalankan permintaan; `status` adalah kode HTTP bila diketahui."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def sse_event(event, data):
+    """Memformat satu event SSE; data dikirim sebagai JSON satu baris."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def chunk_text(text, size=FALLBACK_CHUNK_CHARS):
+    """Memecah teks utuh menjadi potongan untuk dikirim bertahap."""
+    text = str(text)
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def iter_generation(model_pool, model_name, prompt, params=None):
+    """
+    Menghasilkan potongan teks dari Bytez secepat mungkin.
+
+    Memakai mode streaming SDK jika tersedia; jika Bytez mengembalikan respons
+    biasa (output, error, ...), outputnya dipecah menjadi potongan. Error dari
+    Bytez dilempar sebagai `UpstreamError` (membawa status HTTP). Saat generator ditutup (klien
+    terputus), stream upstream ikut ditutup.
+    """
+    upstream = model_pool.run(model_name, prompt, params, stream=True)
+
+    if isinstance(upstream, tuple):
+        if not is_success(upstream):
+            error = upstream[1] if len(upstream) >= 2 else upstream
+            raise UpstreamError(f"Error dari Bytez: {error}", getattr(upstream, 'status', None))
+        upstream = upstream[0]
+    if isinstance(upstream, str) or not hasattr(upstream, '__iter__'):
+        yield from chunk_text(upstream)
+        return
+
+    try:
+        for chunk in upstream:
+            if chunk:
+                yield chunk
+    finally:
+        close = getattr(upstream, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import time
+
+import pytest
+from bytez.client import Response
+
+# Konfigurasi sebelum app di-import: tanpa log request, indeks di direktori sementara
+os.environ['REQUEST_LOG_PATH'] = ''
+os.environ['RAG_INDEX_PATH'] = os.path.join(tempfile.mkdtemp(), 'index.bin')
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+import app as application  # noqa: E402
+import instrumentation  # noqa: E402
+from bytez_pool import UpstreamResponse  # noqa: E402
+from http_cache import PageCache  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+
+
+class FakeModel:
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, input=None, params=None, stream=False):
+        self.client.calls.append(input)
+        if stream:
+            return self._stream()
+        return self.client.response
+
+    def _stream(self):
+        for chunk in self.client.chunks:
+            time.sleep(self.client.chunk_delay)
+            yield chunk
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.response = Response(output="hasil model", error=None, provider="fake")
+        self.chunks = ["baris satu\n", "baris dua"]
+        self.chunk_delay = 0.0
+
+    def model(self, model_name):
+        return FakeModel(self)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeClient()
+    pool = application.ModelPool('kunci', client_factory=lambda api_key: client)
+    monkeypatch.setattr(application, 'model_pool', pool)
+    monkeypatch.setattr(application, 'result_cache', ResultCache())
+    monkeypatch.setattr(application, 'page_cache', PageCache())
+    return client
+
+
+@pytest.fixture
+def client(fake):
+    return application.app.test_client()
+
+
+def _latency_sum(route):
+    return instrumentation.REQUEST_LATENCY.labels(route, '200')._sum.get()
+
+
+def test_stream_is_timed_until_body_closes(client, fake):
+    fake.chunk_delay = 0.1
+    in_flight = instrumentation.IN_FLIGHT._value.get()
+    before = _latency_sum('/stream')
+
+    response = client.get('/stream', buffered=False)
+    assert instrumentation.IN_FLIGHT._value.get() == in_flight + 1
+    body = response.get_data(as_text=True)
+    response.close()
+
+    assert 'event: done' in body
+    assert instrumentation.IN_FLIGHT._value.get() == in_flight
+    assert _latency_sum('/stream') - before >= 0.2
+
+
+def test_stream_closed_before_start_still_finishes(client):
+    in_flight = instrumentation.IN_FLIGHT._value.get()
+    response = client.get('/stream', buffered=False)
+    response.close()
+    assert instrumentation.IN_FLIGHT._value.get() == in_flight
+
+
+def test_three_field_response_renders_and_is_cacheable(client, fake):
+    response = client.get('/')
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert "hasil model" in body
+    assert "nilai" not in body
+    assert response.headers['Cache-Control'].startswith('public')
+    etag = response.headers['ETag']
+
+    revalidated = client.get('/', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert len(fake.calls) == 1
+
+
+def test_error_page_is_not_cached(client, fake):
+    fake.response = Response(output=None, error="model sedang sibuk", provider="fake")
+    response = client.get('/')
+    body = response.get_data(as_text=True)
+    assert "model sedang sibuk" in body
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert 'ETag' not in response.headers
+    assert application.page_cache.stats()['entries'] == 0
+
+    client.get('/')
+    assert len(fake.calls) == 2
+
+
+def test_output_with_error_is_treated_as_failure(client, fake):
+    fake.response = Response(output="sebagian", error="terpotong", provider="fake")
+    response = client.get('/')
+    assert "terpotong" in response.get_data(as_text=True)
+    assert response.headers['Cache-Control'] == 'no-store'
+
+
+def test_broken_index_falls_back_to_plain_question(client, fake, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("indeks rusak")
+
+    monkeypatch.setattr(application.document_index, 'search', broken)
+    assert client.get('/?q=apa kabar').status_code == 200
+    assert fake.calls[-1] == "apa kabar"
+    assert client.get('/stream?q=apa kabar').status_code == 200
+
+
+def test_batch_concurrency_is_capped_by_upstream_slots(client, fake):
+    response = client.post('/batch', json={'items': ['a', 'b'], 'max_concurrency': 1000})
+    assert response.headers['X-Batch-Concurrency'] == str(
+        min(application.BATCH_MAX_WORKERS, application.UPSTREAM_SLOTS))
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 2
+    assert sorted(fake.calls) == ['a', 'b']
+
+
+def test_model_errors_do_not_open_breaker(client, fake, monkeypatch):
+    scheduler = Scheduler(slots=2, hedge=False, breaker_threshold=2, breaker_cooldown=60)
+    monkeypatch.setattr(application, 'scheduler', scheduler)
+    fake.response = UpstreamResponse(output=None, error="parameter tidak valid", status=400)
+    response = client.post('/batch', json={'items': [
+        {'prompt': f"p{i}", 'params': {'max_new_tokens': -1}} for i in range(4)]})
+    assert len(response.get_data(as_text=True).splitlines()) == 4
+    assert len(fake.calls) == 4
+    assert scheduler.breaker.state == 'closed'
+
+    fake.response = UpstreamResponse(output=None, error="tidak ada output", status=200)
+    client.post('/batch', json={'items': ['x', 'y', 'z']})
+    assert scheduler.breaker.state == 'closed'
+
+    fake.response = UpstreamResponse(output=None, error="upstream error", status=503)
+    client.post('/batch', json={'items': ['q1', 'q2']}).get_data()
+    assert scheduler.breaker.state == 'open'
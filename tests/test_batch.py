@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from batch import BatchRunner, parse_items
+
+
+def _run(prompt, params):
+    if prompt.startswith('tidur:'):
+        time.sleep(float(prompt.split(':')[1]))
+    if prompt == 'gagal':
+        return (None, "model error"), 'miss'
+    return (prompt.upper(), None), 'miss'
+
+
+def test_results_for_every_item():
+    runner = BatchRunner(max_workers=4)
+    results = {r['index']: r for r in runner.run(parse_items({'items': ['a', 'gagal', 'c']}, 10), _run, 2, 5)}
+    assert results[0]['ok'] and results[0]['output'] == 'A'
+    assert not results[1]['ok'] and 'model error' in results[1]['error']
+    assert results[2]['output'] == 'C'
+
+
+def test_running_item_times_out():
+    runner = BatchRunner(max_workers=2)
+    items = parse_items({'items': ['tidur:0.5']}, 10)
+    started = time.monotonic()
+    [result] = list(runner.run(items, _run, 1, 0.1))
+    assert not result['ok'] and 'batas waktu' in result['error']
+    assert time.monotonic() - started < 0.4
+
+
+def test_deadline_starts_when_item_runs():
+    # Pool satu thread: item batch kedua mengantre di belakang batch pertama
+    runner = BatchRunner(max_workers=1)
+    first = threading.Thread(target=lambda: list(runner.run(parse_items({'items': ['tidur:0.3']}, 1), _run, 1, 5)))
+    first.start()
+    time.sleep(0.05)
+    [result] = list(runner.run(parse_items({'items': ['cepat']}, 1), _run, 1, 0.2))
+    first.join()
+    assert result['ok'], result
+
+
+def test_timed_out_item_keeps_its_slot():
+    runner = BatchRunner(max_workers=4)
+    started = {}
+
+    def run(prompt, params):
+        started[prompt] = time.monotonic()
+        return _run(prompt, params)
+
+    begin = time.monotonic()
+    results = list(runner.run(parse_items({'items': ['tidur:0.4', 'b']}, 10), run, 1, 0.1))
+    assert [r['ok'] for r in results] == [False, True]
+    # Item kedua baru mulai setelah item yang kehabisan waktu benar-benar selesai
+    assert started['b'] - begin >= 0.35
+
+
+@pytest.mark.parametrize('payload', [None, {}, {'items': []}, {'items': [1]}, {'items': [{'prompt': 'a', 'params': 1}]}])
+def test_parse_items_rejects_invalid_payload(payload):
+    with pytest.raises(ValueError):
+        parse_items(payload, 10)
+
+
+def test_parse_items_limit():
+    with pytest.raises(ValueError):
+        parse_items({'items': ['a'] * 3}, 2)
+    assert parse_items({'items': ['a', {'prompt': 'b', 'params': {'t': 1}}]}, 2) == [
+        {'prompt': 'a', 'params': None},
+        {'prompt': 'b', 'params': {'t': 1}},
+    ]
@@ -0,0 +1,130 @@
+import os
+
+import pytest
+import requests
+from bytez.client import Response
+
+from bytez_pool import ModelPool, UpstreamResponse, is_outage
+
+
+class FakeHandle:
+    def __init__(self, sdk):
+        self.sdk = sdk
+
+    def run(self, *args, **kwargs):
+        self.sdk.calls += 1
+        if self.sdk.failures:
+            raise self.sdk.failures.pop(0)
+        return Response(output="ok", error=None)
+
+
+class FakeList:
+    def __init__(self, sdk):
+        self.sdk = sdk
+
+    def models(self, options=None):
+        return Response(output=[{'modelId': options['modelId']}], error=self.sdk.list_error)
+
+
+class FakeSDK:
+    def __init__(self):
+        self.calls = 0
+        self.failures = []
+        self.list_error = None
+        self.list = FakeList(self)
+
+    def model(self, model_name):
+        return FakeHandle(self)
+
+
+@pytest.fixture
+def sdk():
+    return FakeSDK()
+
+
+@pytest.fixture
+def pool(sdk):
+    return ModelPool('kunci', client_factory=lambda api_key: sdk)
+
+
+def test_handle_is_reused(pool):
+    first = pool.get('m')
+    assert pool.get('m') is first
+    assert pool.run('m', 'prompt') == ("ok", None, None)
+    stats = pool.stats()['models']['m']
+    assert stats['created'] == 1
+    assert stats['reused'] == 2
+
+
+def test_connection_error_retries_with_new_handle(pool, sdk):
+    first = pool.get('m')
+    sdk.failures = [requests.ConnectionError("koneksi ditutup")]
+    assert pool.run('m', 'prompt')[0] == "ok"
+    assert sdk.calls == 2
+    assert pool.get('m') is not first
+    assert pool.stats()['models']['m']['rebuilt'] == 1
+
+
+@pytest.mark.parametrize('error', [requests.ReadTimeout("lambat"), requests.ConnectTimeout("lambat")])
+def test_timeout_is_not_retried(pool, sdk, error):
+    sdk.failures = [error]
+    with pytest.raises(requests.Timeout):
+        pool.run('m', 'prompt')
+    assert sdk.calls == 1
+
+
+def test_other_error_drops_handle_without_retry(pool, sdk):
+    first = pool.get('m')
+    sdk.failures = [ValueError("handle rusak")]
+    with pytest.raises(ValueError):
+        pool.run('m', 'prompt')
+    assert sdk.calls == 1
+    assert pool.get('m') is not first
+
+
+def test_read_timeout_follows_deadline():
+    remaining = [None]
+    pool = ModelPool('kunci', client_factory=FakeSDK, timeout=(5.0, 60.0), deadline=lambda: remaining[0])
+    assert pool._timeout() == (5.0, 60.0)
+    remaining[0] = 2.0
+    assert pool._timeout() == (2.0, 2.0)
+    remaining[0] = -1
+    assert pool._timeout() == (0.05, 0.05)
+
+
+def test_failed_health_check_drops_handle(pool, sdk):
+    first = pool.get('m')
+    assert pool.health_check('m') is True
+    assert pool.get('m') is first
+
+    sdk.list_error = "model tidak ditemukan"
+    assert pool.health_check('m') is False
+    assert pool.stats()['models']['m']['healthy'] is False
+    assert pool.get('m') is not first
+
+
+def test_only_server_errors_and_exceptions_are_outages():
+    assert is_outage(UpstreamResponse(error="upstream error", status=503))
+    assert not is_outage(UpstreamResponse(error="parameter tidak valid", status=422))
+    assert not is_outage(UpstreamResponse(output=None, status=200))
+    assert is_outage(Response(error="koneksi gagal"))
+    assert is_outage(requests.ConnectionError())
+
+
+def test_warm_builds_handle(pool):
+    pool.warm(['m'])
+    stats = pool.stats()['models']['m']
+    assert stats['warm'] is True
+    assert stats['created'] == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="butuh os.fork")
+def test_pool_is_empty_after_fork(pool):
+    pool.get('m')
+    pid = os.fork()
+    if pid == 0:
+        stats = pool.stats()
+        os._exit(0 if stats['size'] == 0 and stats['pid'] == os.getpid() and not stats['models'] else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert pool.stats()['size'] == 1
@@ -0,0 +1,144 @@
+import gzip
+import json
+import time
+
+import pytest
+
+import request_log
+from request_log import RequestLogger
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real_fsync = request_log.os.fsync
+    monkeypatch.setattr(request_log.os, 'fsync', lambda fd: calls.append(fd) or real_fsync(fd))
+    return calls
+
+
+def test_flushes_when_batch_reaches_record_count(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    logger = RequestLogger(str(path), flush_records=3, flush_interval=60)
+    for i in range(2):
+        logger.log({'i': i})
+    time.sleep(0.1)
+    assert logger.stats()['written'] == 0
+
+    logger.log({'i': 2})
+    assert wait_for(lambda: logger.stats()['written'] == 3)
+    assert [record['i'] for record in read_lines(path)] == [0, 1, 2]
+    assert logger.stats()['flushes'] == 1
+    logger.close()
+
+
+def test_flushes_after_interval(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    logger = RequestLogger(str(path), flush_records=1000, flush_interval=0.05)
+    logger.log({'i': 0})
+    assert wait_for(lambda: logger.stats()['written'] == 1)
+    assert read_lines(path) == [{'i': 0}]
+    logger.close()
+
+
+def test_fsync_never(tmp_path, fsyncs):
+    logger = RequestLogger(str(tmp_path / 'log.jsonl'), fsync_policy='never')
+    logger._flush([{'i': 0}])
+    logger._flush([{'i': 1}])
+    assert fsyncs == []
+
+
+def test_fsync_every_batch(tmp_path, fsyncs):
+    logger = RequestLogger(str(tmp_path / 'log.jsonl'), fsync_policy='batch')
+    logger._flush([{'i': 0}])
+    logger._flush([{'i': 1}])
+    assert len(fsyncs) == 2
+
+
+def test_fsync_at_most_once_per_interval(tmp_path, fsyncs):
+    logger = RequestLogger(str(tmp_path / 'log.jsonl'), fsync_policy='interval', fsync_interval=3600)
+    logger._flush([{'i': 0}])
+    assert fsyncs == []
+
+    logger._last_fsync -= 3600
+    logger._flush([{'i': 1}])
+    logger._flush([{'i': 2}])
+    assert len(fsyncs) == 1
+
+
+def test_samples_above_high_water_mark(tmp_path, monkeypatch):
+    logger = RequestLogger(str(tmp_path / 'log.jsonl'), max_queue=10, high_water=0.5, sample_rate=0.0)
+    monkeypatch.setattr(logger, '_ensure_thread', lambda: None)
+    for i in range(10):
+        logger.log({'i': i})
+    stats = logger.stats()
+    assert stats['logged'] == 5
+    assert stats['sampled_out'] == 5
+    assert stats['queued'] == 5
+
+
+def test_drops_when_queue_is_full(tmp_path, monkeypatch):
+    logger = RequestLogger(str(tmp_path / 'log.jsonl'), max_queue=4, high_water=1.0, sample_rate=1.0)
+    monkeypatch.setattr(logger, '_ensure_thread', lambda: None)
+    for i in range(6):
+        logger.log({'i': i})
+    stats = logger.stats()
+    assert stats['logged'] == 4
+    assert stats['dropped'] == 2
+    assert stats['sampled_out'] == 0
+
+
+def test_rotation_compresses_and_keeps_backups(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    logger = RequestLogger(str(path), rotate_bytes=100, backups=2)
+    for i in range(3):
+        logger._flush([{'i': i, 'pad': 'x' * 100}])
+
+    assert logger.stats()['rotations'] == 3
+    with gzip.open(f"{path}.1.gz", 'rt', encoding='utf-8') as f:
+        assert json.loads(f.read())['i'] == 2
+    with gzip.open(f"{path}.2.gz", 'rt', encoding='utf-8') as f:
+        assert json.loads(f.read())['i'] == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['log.jsonl.1.gz', 'log.jsonl.2.gz']
+
+
+def test_compression_failure_keeps_batch_and_rotated_file(tmp_path, monkeypatch):
+    path = tmp_path / 'log.jsonl'
+    logger = RequestLogger(str(path), rotate_bytes=100)
+
+    def broken(*args, **kwargs):
+        raise OSError("disk penuh")
+
+    monkeypatch.setattr(request_log.gzip, 'open', broken)
+    logger._flush([{'i': 0, 'pad': 'x' * 100}])
+
+    stats = logger.stats()
+    assert stats['written'] == 1
+    assert stats['write_errors'] == 0
+    assert stats['compress_errors'] == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['log.jsonl.1']
+    assert read_lines(f"{path}.1")[0]['i'] == 0
+
+
+def test_close_writes_remaining_queue(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    logger = RequestLogger(str(path), flush_records=1000, flush_interval=60)
+    for i in range(5):
+        logger.log({'i': i})
+    logger.close()
+
+    assert [record['i'] for record in read_lines(path)] == list(range(5))
+    assert logger.stats()['written'] == 5
+    logger.log({'i': 5})
+    assert logger.stats()['logged'] == 5
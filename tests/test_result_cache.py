@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+
+import pytest
+
+from result_cache import DiskStore, FlightTimeout, ResultCache, make_key
+
+
+def test_hit_after_miss():
+    cache = ResultCache()
+    calls = []
+
+    def run():
+        calls.append(1)
+        return ("halo", None)
+
+    assert cache.get_or_run("m", "p", None, run) == (("halo", None), 'miss')
+    assert cache.get_or_run("m", "p", None, run) == (("halo", None), 'hit')
+    assert len(calls) == 1
+    assert cache.stats()['stored'] == 1
+
+
+def test_failed_response_is_not_stored():
+    cache = ResultCache()
+    assert cache.get_or_run("m", "p", None, lambda: (None, "gagal"))[1] == 'miss'
+    assert cache.get_or_run("m", "p", None, lambda: (None, "gagal"))[1] == 'miss'
+    stats = cache.stats()
+    assert stats['stored'] == 0
+    assert stats['not_stored'] == 2
+
+
+def test_oversized_response_counts_as_not_stored():
+    cache = ResultCache(max_bytes=10)
+    cache.get_or_run("m", "p", None, lambda: ("x" * 100, None))
+    stats = cache.stats()
+    assert stats['stored'] == 0
+    assert stats['not_stored'] == 1
+    assert stats['entries'] == 0
+
+
+def test_identical_requests_share_one_call():
+    cache = ResultCache()
+    release = threading.Event()
+    calls = []
+
+    def run():
+        calls.append(1)
+        release.wait(5)
+        return ("halo", None)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_run("m", "p", None, run)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['coalesced'] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(status for _, status in results) == ['coalesced'] * 4 + ['miss']
+    assert all(response == ("halo", None) for response, _ in results)
+
+
+def test_leader_exception_reaches_followers():
+    cache = ResultCache()
+    release = threading.Event()
+    errors = []
+
+    def run():
+        release.wait(5)
+        raise RuntimeError("upstream mati")
+
+    def call():
+        try:
+            cache.get_or_run("m", "p", None, run)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['coalesced'] < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ["upstream mati"] * 3
+    assert cache.stats()['in_flight'] == 0
+
+
+def test_expired_entry_is_available_as_stale():
+    cache = ResultCache(ttl=0.05)
+    cache.put("m", "p", None, ("lama", None))
+    time.sleep(0.1)
+    assert cache.peek("m", "p") is None
+    assert cache.peek("m", "p", stale=True) == ("lama", None)
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    for prompt in ("a", "b", "c"):
+        cache.put("m", prompt, None, (prompt, None))
+    assert cache.peek("m", "a") is None
+    assert cache.peek("m", "c") == ("c", None)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disk_store_survives_new_cache(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).put("m", "p", None, ("disimpan", None))
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.get_or_run("m", "p", None, pytest.fail) == (("disimpan", None), 'hit')
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_disk_prune_is_rate_limited(tmp_path):
+    store = DiskStore(str(tmp_path), max_entries=2, prune_interval=3600)
+    expires = time.time() + 60
+    for i in range(5):
+        store.set(make_key("m", str(i)), ("x", None), expires)
+    # Hanya penulisan pertama yang memangkas; sisanya menunggu interval berikutnya
+    assert len(list(tmp_path.glob('*.json'))) == 5
+
+    store.prune_interval = 0
+    store.set(make_key("m", "terakhir"), ("x", None), expires)
+    assert len(list(tmp_path.glob('*.json'))) == 2
+
+
+def test_follower_waits_only_its_own_timeout():
+    cache = ResultCache()
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: cache.get_or_run("m", "p", None, lambda: release.wait(5) and ("x", None)))
+    leader.start()
+    while cache.stats()['in_flight'] == 0:
+        time.sleep(0.01)
+
+    started = time.monotonic()
+    with pytest.raises(FlightTimeout):
+        cache.get_or_run("m", "p", None, pytest.fail, wait_timeout=0.1)
+    assert time.monotonic() - started < 0.5
+
+    release.set()
+    leader.join(5)
+    assert cache.get_or_run("m", "p", None, pytest.fail) == (("x", None), 'hit')
+
+
+def test_missing_disk_dir_does_not_break_leader(tmp_path):
+    directory = tmp_path / 'cache'
+    cache = ResultCache(disk_dir=str(directory), ttl=0.05)
+    directory.rmdir()
+
+    assert cache.get_or_run("m", "p", None, lambda: ("halo", None)) == (("halo", None), 'miss')
+    assert cache.stats()['in_flight'] == 0
+    time.sleep(0.1)
+    assert cache.get_or_run("m", "p", None, lambda: ("baru", None), wait_timeout=0.1) == (("baru", None), 'miss')
+
+
+def test_prune_skips_files_removed_concurrently(tmp_path, monkeypatch):
+    store = DiskStore(str(tmp_path), max_entries=1, prune_interval=0)
+    expires = time.time() + 60
+    for i in range(3):
+        store.set(make_key("m", str(i)), ("x", None), expires)
+    real_scandir = os.scandir
+
+    def scandir_then_remove(path):
+        entries = list(real_scandir(path))
+        os.remove(entries[0].path)
+        return iter(entries)
+
+    monkeypatch.setattr(os, 'scandir', scandir_then_remove)
+    store.set(make_key("m", "baru"), ("x", None), expires)
+    monkeypatch.undo()
+    assert len(list(tmp_path.glob('*.json'))) == 1
+
+
+def test_result_stored_between_checks_is_not_fetched_again():
+    cache = ResultCache()
+    # Pemanggil pertama lain selesai tepat setelah pengecekan memori pertama
+    cache._load_disk = lambda key: cache.put("m", "p", None, ("sudah ada", None)) and None
+    assert cache.get_or_run("m", "p", None, pytest.fail) == (("sudah ada", None), 'hit')
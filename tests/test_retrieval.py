@@ -0,0 +1,102 @@
+import os
+import time
+
+import pytest
+
+from retrieval import DocumentIndex, build_prompt, chunk_document
+
+
+@pytest.fixture
+def docs(tmp_path):
+    directory = tmp_path / 'docs'
+    directory.mkdir()
+    (directory / 'robot.txt').write_text("Robot itu bermimpi tentang domba listrik.\n\nIa tinggal di kota.")
+    (directory / 'kopi.md').write_text("Kopi tubruk diseduh dengan air mendidih.")
+    return directory
+
+
+def make_index(tmp_path, docs, **kwargs):
+    return DocumentIndex(str(tmp_path / 'index.bin'), directory=str(docs), **kwargs)
+
+
+def test_search_finds_relevant_chunk(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    assert index.refresh() is True
+    [hit] = index.search("domba listrik", k=1)
+    assert hit['file'].endswith('robot.txt')
+    assert 'domba' in hit['text']
+
+
+def test_touch_without_content_change_does_not_rewrite(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    index.refresh()
+    before = os.stat(index.index_path).st_mtime_ns
+    later = time.time() + 10
+    os.utime(docs / 'robot.txt', (later, later))
+
+    assert index.refresh() is False
+    assert index.refresh() is False
+    assert os.stat(index.index_path).st_mtime_ns == before
+    assert index.stats()['rebuilds'] == 1
+
+
+def test_content_change_rebuilds(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    index.refresh()
+    (docs / 'kopi.md').write_text("Teh tarik diminum dingin.")
+    assert index.refresh() is True
+    assert index.search("teh tarik", k=1)[0]['file'].endswith('kopi.md')
+    assert index.search("kopi tubruk", k=1) == []
+
+
+def test_other_worker_reuses_index_on_disk(tmp_path, docs):
+    make_index(tmp_path, docs).refresh()
+    other = make_index(tmp_path, docs)
+    assert other.refresh() is False
+    assert other.stats()['reloads'] == 1
+    assert other.search("kota", k=1)
+
+
+def test_unwritable_index_path_serves_from_memory(tmp_path, docs):
+    index = DocumentIndex(str(tmp_path / 'tidak-ada' / 'index.bin'), directory=str(docs))
+    assert index.refresh() is True
+    assert index.stats()['write_errors'] == 1
+    assert index.search("kopi", k=1)
+
+
+def test_search_never_builds_in_request_path(tmp_path, docs, monkeypatch):
+    index = make_index(tmp_path, docs, refresh_interval=3600)
+    calls = []
+    monkeypatch.setattr(index, '_rebuild', lambda files: calls.append(files) or time.sleep(0.5))
+    started = time.monotonic()
+    assert index.search("robot") == []
+    assert time.monotonic() - started < 0.2
+
+
+def test_background_refresh_loads_index(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    index.start()
+    deadline = time.monotonic() + 5
+    while not index.search("robot") and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert index.search("robot")
+
+
+def test_vectorized_bm25_matches_python_scoring(tmp_path, docs):
+    pytest.importorskip('numpy')
+    (docs / 'kota.txt').write_text("Kota robot.\n\nRobot dan robot lagi di kota yang ramai.")
+    index = make_index(tmp_path, docs)
+    index.refresh()
+    snapshot = index._snapshot
+    for query in (["robot"], ["robot", "kota", "kopi"], ["tidakada"]):
+        expected = snapshot._bm25_python(query, 3)
+        actual = snapshot.bm25(query, 3)
+        assert [doc for doc, _ in actual] == [doc for doc, _ in expected]
+        assert [score for _, score in actual] == pytest.approx([score for _, score in expected], rel=1e-5)
+
+
+def test_chunk_document_and_build_prompt():
+    chunks = chunk_document("a" * 10 + "\n\n" + "b" * 10, max_chars=15)
+    assert chunks == ["a" * 10, "b" * 10]
+    assert build_prompt("tanya?", []) == "tanya?"
+    assert "[1] isi" in build_prompt("tanya?", [{'text': 'isi'}])
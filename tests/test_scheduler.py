@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import (
+    BATCH,
+    INTERACTIVE,
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    Scheduler,
+    deadline_remaining,
+)
+
+
+def _hold_slot(scheduler, release, timeout=5):
+    """Menjalankan panggilan yang memegang slot sampai `release` di-set."""
+    thread = threading.Thread(target=lambda: scheduler.call(lambda: release.wait(timeout), INTERACTIVE, timeout))
+    thread.start()
+    while scheduler.stats()['busy'] == 0:
+        time.sleep(0.005)
+    return thread
+
+
+def test_call_returns_result():
+    scheduler = Scheduler(slots=2, hedge=False)
+    assert scheduler.call(lambda: "ok", INTERACTIVE, 1) == "ok"
+    assert scheduler.stats()['busy'] == 0
+
+
+def test_interactive_runs_before_batch():
+    scheduler = Scheduler(slots=1, hedge=False)
+    release = threading.Event()
+    holder = _hold_slot(scheduler, release)
+    order = []
+
+    def queued(name, priority):
+        scheduler.call(lambda: order.append(name), priority, 5)
+
+    waiters = [threading.Thread(target=queued, args=('batch', BATCH))]
+    waiters[0].start()
+    while scheduler.stats()['queued'] < 1:
+        time.sleep(0.005)
+    waiters.append(threading.Thread(target=queued, args=('interactive', INTERACTIVE)))
+    waiters[1].start()
+    while scheduler.stats()['queued'] < 2:
+        time.sleep(0.005)
+
+    release.set()
+    for thread in [holder] + waiters:
+        thread.join(5)
+    assert order == ['interactive', 'batch']
+
+
+def test_deadline_while_queued():
+    scheduler = Scheduler(slots=1, hedge=False)
+    release = threading.Event()
+    holder = _hold_slot(scheduler, release)
+    with pytest.raises(DeadlineExceeded):
+        scheduler.call(lambda: "tidak jalan", INTERACTIVE, 0.1)
+    release.set()
+    holder.join(5)
+    assert scheduler.stats()['queued'] == 0
+
+
+def test_deadline_is_visible_to_upstream_call():
+    scheduler = Scheduler(slots=1, hedge=False)
+    remaining = scheduler.call(deadline_remaining, INTERACTIVE, 2)
+    assert 1.5 < remaining <= 2
+    assert deadline_remaining() is None
+
+
+def test_hung_calls_trip_breaker():
+    scheduler = Scheduler(slots=4, hedge=False, breaker_threshold=5)
+    release = threading.Event()
+    for _ in range(2):
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            scheduler.call(lambda: release.wait(5), INTERACTIVE, 0.1)
+        assert time.monotonic() - started < 1
+    # Setengah slot dipegang panggilan yang ditinggalkan: breaker terbuka
+    # walaupun jumlah kegagalan belum mencapai threshold
+    assert scheduler.stats()['abandoned_running'] == 2
+    assert scheduler.breaker.state == 'open'
+    with pytest.raises(CircuitOpen):
+        scheduler.call(lambda: "ok", INTERACTIVE, 1)
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while scheduler.stats()['busy'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.stats()['abandoned_running'] == 0
+
+
+def test_failed_results_open_breaker():
+    scheduler = Scheduler(slots=2, hedge=False, breaker_threshold=3, breaker_cooldown=60)
+    for _ in range(3):
+        assert scheduler.call(lambda: (None, "error"), INTERACTIVE, 1, lambda r: r[1] is not None) == (None, "error")
+    with pytest.raises(CircuitOpen):
+        scheduler.call(lambda: ("ok", None), INTERACTIVE, 1)
+
+
+def test_only_outages_open_breaker():
+    scheduler = Scheduler(slots=2, hedge=False, breaker_threshold=2, breaker_cooldown=60)
+
+    class Result(tuple):
+        status = 400
+
+    def failed(result):
+        return result[1] is not None
+
+    def outage(outcome):
+        return getattr(outcome, 'status', 500) >= 500
+
+    for _ in range(3):
+        assert scheduler.call(lambda: Result((None, "parameter salah")), INTERACTIVE, 1, failed, outage)[1]
+    assert scheduler.breaker.state == 'closed'
+
+    for _ in range(2):
+        scheduler.call(lambda: (None, "error"), INTERACTIVE, 1, failed, outage)
+    assert scheduler.breaker.state == 'open'
+
+
+def test_reserve_counts_only_outage_exceptions():
+    scheduler = Scheduler(slots=1, hedge=False, breaker_threshold=1, breaker_cooldown=60)
+    rejected = ValueError("parameter salah")
+    with pytest.raises(ValueError):
+        with scheduler.reserve(INTERACTIVE, 1, lambda exc: exc is not rejected):
+            raise rejected
+    assert scheduler.breaker.state == 'closed'
+
+    with pytest.raises(RuntimeError):
+        with scheduler.reserve(INTERACTIVE, 1, lambda exc: exc is not rejected):
+            raise RuntimeError("koneksi putus")
+    assert scheduler.breaker.state == 'open'
+
+
+def test_breaker_half_open_allows_single_trial():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record(False)
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_slow_call_is_hedged():
+    scheduler = Scheduler(slots=2, hedge=True, hedge_min_samples=3)
+    for _ in range(3):
+        scheduler.call(lambda: "cepat", INTERACTIVE, 1)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "lambat"
+        return "hedge"
+
+    assert scheduler.call(fn, INTERACTIVE, 2) == "hedge"
+    stats = scheduler.stats()
+    assert stats['hedged'] == 1
+    assert stats['hedge_wins'] == 1
+
+
+def test_reserve_holds_a_slot():
+    scheduler = Scheduler(slots=1, hedge=False)
+    with scheduler.reserve(INTERACTIVE, 1):
+        assert scheduler.stats()['busy'] == 1
+        with pytest.raises(DeadlineExceeded):
+            scheduler.call(lambda: "ok", INTERACTIVE, 0.05)
+    assert scheduler.stats()['busy'] == 0
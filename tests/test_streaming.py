@@ -0,0 +1,92 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from bytez import Bytez
+
+from bytez_pool import ModelPool
+from bytez_pool import is_outage
+from streaming import UpstreamError, chunk_text, iter_generation, sse_event
+
+TEXT = "baris satu\nbaris dua\n\nbaris empat"
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = b'{"output": [{"task": "text-generation"}], "error": null}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+        if body['input'] in ('gagal', 'parameter salah'):
+            status = 500 if body['input'] == 'gagal' else 400
+            error = json.dumps({'output': None, 'error': 'upstream error'}).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(error)))
+            self.end_headers()
+            self.wfile.write(error)
+            return
+        self.send_response(200)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for piece in (TEXT[:7], TEXT[7:15], TEXT[15:]):
+            data = piece.encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+@pytest.fixture
+def pool():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def factory(api_key):
+        sdk = Bytez(api_key)
+        sdk._client.host = f"http://127.0.0.1:{server.server_address[1]}/models/v2/"
+        return sdk
+
+    yield ModelPool('kunci', client_factory=factory, timeout=(1, 2))
+    server.shutdown()
+
+
+def test_stream_keeps_line_breaks(pool):
+    chunks = iter_generation(pool, 'model', 'prompt')
+    assert "".join(chunks) == TEXT
+
+
+def test_http_error_is_not_streamed_as_text(pool):
+    with pytest.raises(UpstreamError, match="upstream error") as excinfo:
+        list(iter_generation(pool, 'model', 'gagal'))
+    assert excinfo.value.status == 500
+    assert is_outage(excinfo.value)
+
+
+def test_rejected_request_is_not_an_outage(pool):
+    with pytest.raises(UpstreamError) as excinfo:
+        list(iter_generation(pool, 'model', 'parameter salah'))
+    assert excinfo.value.status == 400
+    assert not is_outage(excinfo.value)
+
+
+def test_failed_response_raises():
+    class FailingPool:
+        def run(self, *args, **kwargs):
+            return (None, "model tidak ada")
+
+    with pytest.raises(RuntimeError, match="model tidak ada"):
+        list(iter_generation(FailingPool(), 'model', 'prompt'))
+
+
+def test_chunk_text_and_sse_event():
+    assert "".join(chunk_text("a\nb" * 50, size=7)) == "a\nb" * 50
+    assert sse_event('chunk', "a\nb") == 'event: chunk\ndata: "a\\nb"\n\n'